@@ -0,0 +1,61 @@
+"""
+Recall/latency benchmark of the IVF gallery backend against brute force.
+
+    python benchmarks/ann_recall.py --sizes 10000 50000 200000 --nprobe 4 8 16
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+import config  # noqa: E402
+from gallery import GalleryIndex  # noqa: E402
+from synthetic import synthetic_gallery, noisy_queries  # noqa: E402
+
+
+def build(encodings, backend):
+    gallery = GalleryIndex(capacity=len(encodings), backend=backend)
+    for student_id, encoding in enumerate(encodings, start=1):
+        gallery.add(student_id, encoding)
+    return gallery
+
+
+def run(size, nprobes, queries_count, seed=0):
+    encodings = synthetic_gallery(size, seed=seed)
+    queries = noisy_queries(encodings, queries_count, seed=seed + 1)
+
+    exact = build(encodings, "exact")
+    start = time.perf_counter()
+    expected = [exact.match([q]) for q in queries]
+    exact_ms = (time.perf_counter() - start) * 1000 / queries_count
+    print(f"n={size:>7} exact      {exact_ms:8.3f} ms/query")
+
+    config.IVF_MIN_GALLERY_SIZE = 0
+    for nprobe in nprobes:
+        config.IVF_NPROBE = nprobe
+        ivf = build(encodings, "ivf")
+        start = time.perf_counter()
+        ivf.match(queries[:1])  # Trains the index
+        train_s = time.perf_counter() - start
+
+        start = time.perf_counter()
+        got = [ivf.match([q]) for q in queries]
+        ivf_ms = (time.perf_counter() - start) * 1000 / queries_count
+
+        recall = np.mean([g[0][0] == e[0][0] for g, e in zip(got, expected)])
+        print(f"n={size:>7} ivf np={nprobe:<3} {ivf_ms:8.3f} ms/query  "
+              f"recall={recall:.4f}  speedup={exact_ms / ivf_ms:5.1f}x  train={train_s:.1f}s")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10000, 50000])
+    parser.add_argument("--nprobe", type=int, nargs="+", default=[4, 8, 16])
+    parser.add_argument("--queries", type=int, default=200)
+    args = parser.parse_args()
+    for size in args.sizes:
+        run(size, args.nprobe, args.queries)
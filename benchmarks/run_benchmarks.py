@@ -0,0 +1,261 @@
+"""
+Per-stage performance benchmarks that run offline.
+
+    python benchmarks/run_benchmarks.py --sizes 1000 10000 200000 --video lecture.mp4 --output results.json
+    python benchmarks/run_benchmarks.py --frames frames/ --compare results.json
+
+Synthetic galleries are loaded through the embedded SQLite backend, using a
+temporary database file. Recorded frames (a directory of images or a video file) are
+replayed through detection, encoding and display conversion. Results are
+written as JSON so runs from different commits can be compared.
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+import cv2
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+import config  # noqa: E402
+from attendance import AttendanceWriter  # noqa: E402
+from gallery import GalleryIndex  # noqa: E402
+from sqlite_database import SQLiteDatabase  # noqa: E402
+from synthetic import synthetic_gallery, noisy_queries  # noqa: E402
+
+
+class StageTimer:
+    """Collects wall-clock samples per stage and summarizes them in ms."""
+
+    def __init__(self):
+        self.samples = {}
+
+    def time(self, stage, fn, *args, **kwargs):
+        start = time.perf_counter()
+        result = fn(*args, **kwargs)
+        self.samples.setdefault(stage, []).append(time.perf_counter() - start)
+        return result
+
+    def summary(self):
+        results = {}
+        for stage, samples in self.samples.items():
+            ms = np.array(samples) * 1000
+            results[stage] = {
+                "count": len(ms),
+                "mean_ms": float(ms.mean()),
+                "p50_ms": float(np.percentile(ms, 50)),
+                "p95_ms": float(np.percentile(ms, 95)),
+                "p99_ms": float(np.percentile(ms, 99)),
+                "total_ms": float(ms.sum()),
+            }
+        return results
+
+
+def bench_gallery(size, queries_count, repeats, db_path):
+    """Gallery load from the database and matching at one gallery size."""
+    timer = StageTimer()
+    encodings = synthetic_gallery(size)
+    db = SQLiteDatabase(db_path)
+    db.insert_students_batch((f"Student {i}", encoding, None) for i, encoding in enumerate(encodings))
+
+    for _ in range(repeats):
+        gallery = timer.time("gallery_load", GalleryIndex.from_db, db)
+
+    queries = noisy_queries(encodings, queries_count)
+    for query in queries:
+        timer.time("match_1_face", gallery.match, [query])
+    for start in range(0, queries_count - 7, 8):
+        timer.time("match_8_faces", gallery.match, queries[start:start + 8])
+    db.close()
+    return timer.summary()
+
+
+def bench_attendance(marks_count, db_path):
+    """Buffered attendance writes, with summary upkeep, and summary reads against the local database."""
+    timer = StageTimer()
+    db = SQLiteDatabase(db_path)
+    students = marks_count // 2 or 1
+    db.insert_students_batch((f"Student {i}", np.zeros(128), None) for i in range(students))
+    now = datetime.now()
+    class_id = db.insert_class("Benchmark", now - timedelta(hours=1), now + timedelta(hours=1))
+    # Time every batched write the writer issues, not just the final flush
+    insert_batch = db.insert_attendance_batch
+    db.insert_attendance_batch = lambda marks: timer.time("attendance_write", insert_batch, marks)
+    writer = AttendanceWriter(db, flush_interval=3600)
+    for student_id in range(marks_count):
+        # Every student is seen twice, so half the marks are duplicates
+        timer.time("attendance_mark", writer.mark, student_id % students + 1, class_id, now)
+    writer.flush()
+    for _ in range(10):
+        timer.time("summary_read", db.fetch_class_summaries, now.date(), now.date())
+    db.close()
+    return timer.summary()
+
+
+def read_frames(frames_dir=None, video=None, max_frames=100):
+    if frames_dir:
+        names = sorted(n for n in os.listdir(frames_dir) if n.lower().endswith((".jpg", ".jpeg", ".png")))
+        for name in names[:max_frames]:
+            yield cv2.imread(os.path.join(frames_dir, name))
+        return
+    capture = cv2.VideoCapture(video)
+    for _ in range(max_frames):
+        ret, frame = capture.read()
+        if not ret:
+            break
+        yield frame
+    capture.release()
+
+
+def allocated_bytes(fn, *args):
+    """Bytes allocated by one call: peak traced memory above what was in use before it."""
+    tracemalloc.reset_peak()
+    before = tracemalloc.get_traced_memory()[0]
+    fn(*args)
+    return tracemalloc.get_traced_memory()[1] - before
+
+
+def bench_frames(frames, allocation_frames=10):
+    """
+    Motion gating, detection, encoding and display conversion on replayed
+    frames. Batched encoding is checked against face_recognition's own
+    encodings of the same faces. The colour conversion and display stages also report bytes
+    allocated per frame from Python and numpy (traced on the first few
+    frames in a separate pass, so tracing does not skew the timings) and
+    frame data throughput.
+    """
+    # Imported here so gallery-only runs do not need dlib or Qt
+    import face_recognition
+    from batching import batch_face_encodings
+    from display import FrameRenderer
+    from face_recognition_module import detect_faces
+    from motion import MotionGate
+
+    timer = StageTimer()
+    gate = MotionGate(force_seconds=float("inf"))
+    renderer = FrameRenderer(800, 600)
+    rgb_buffer = None
+    faces = gated = 0
+    batch_mismatch = 0.0
+    frame_bytes = 0
+    sample = []
+    for index, frame in enumerate(frames):
+        frame_bytes = frame.nbytes
+        if len(sample) < allocation_frames:
+            sample.append(frame)
+        # Every frame is still detected so timings stay comparable; this only counts what the gate would skip
+        if not timer.time("motion_gate", gate.changed, frame, index):
+            gated += 1
+        rgb_buffer = timer.time("color_conversion", cv2.cvtColor, frame, cv2.COLOR_BGR2RGB, rgb_buffer)
+        locations = timer.time("detection", detect_faces, rgb_buffer)
+        if locations:
+            encodings = timer.time("encoding", face_recognition.face_encodings, rgb_buffer, locations)
+            batched = timer.time("encoding_batched", batch_face_encodings, [rgb_buffer], [locations])
+            batch_mismatch = max(batch_mismatch, float(np.abs(np.subtract(encodings, batched)).max()))
+            faces += len(locations)
+
+        # The copy stands in for the upload QPixmap.fromImage does in the GUI
+        results = [(location, 0, "Student") for location in locations]
+        timer.time("display_conversion", lambda: renderer.render(frame, results).copy())
+
+    summary = timer.summary()
+    summary["faces_detected"] = faces
+    summary["frames_without_motion"] = gated
+    # Batched and per-frame encodings must agree, or multi-camera matches drift from the gallery
+    summary["batched_encoding_max_diff"] = batch_mismatch
+    if batch_mismatch > 1e-5:
+        print(f"WARNING: batched encodings differ from face_recognition.face_encodings by up to {batch_mismatch:.6f}")
+
+    tracemalloc.start()
+    try:
+        allocations = {"color_conversion": [], "display_conversion": []}
+        for frame in sample:
+            allocations["color_conversion"].append(
+                allocated_bytes(cv2.cvtColor, frame, cv2.COLOR_BGR2RGB, rgb_buffer))
+            allocations["display_conversion"].append(
+                allocated_bytes(lambda: renderer.render(frame).copy()))
+    finally:
+        tracemalloc.stop()
+    for stage, samples in allocations.items():
+        if stage in summary and samples:
+            summary[stage]["alloc_bytes_per_frame"] = float(np.mean(samples))
+            summary[stage]["frame_MBps"] = frame_bytes / 1e6 / (summary[stage]["p50_ms"] / 1000)
+    return summary
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=os.path.dirname(__file__), text=True
+        ).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(current, previous):
+    """Print p50 changes for every stage present in both result files."""
+    def stages(results):
+        flat = {}
+        for size, summary in results.get("galleries", {}).items():
+            flat.update({f"{stage}@{size}": s for stage, s in summary.items()})
+        for section in ("attendance", "frames"):
+            flat.update({stage: s for stage, s in results.get(section, {}).items() if isinstance(s, dict)})
+        return flat
+
+    old, new = stages(previous), stages(current)
+    print(f"\nCompared with {previous.get('commit')}:")
+    for stage in sorted(set(old) & set(new)):
+        before, after = old[stage]["p50_ms"], new[stage]["p50_ms"]
+        change = (after - before) / before * 100 if before else 0.0
+        print(f"  {stage:<32} {before:10.3f} -> {after:10.3f} ms p50  ({change:+.1f}%)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run the offline performance benchmarks.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 50000], help="synthetic gallery sizes")
+    parser.add_argument("--queries", type=int, default=200, help="match queries per gallery size")
+    parser.add_argument("--load-repeats", type=int, default=3, help="gallery loads per gallery size")
+    parser.add_argument("--marks", type=int, default=2000, help="attendance marks to write")
+    parser.add_argument("--frames", help="directory of frames to replay")
+    parser.add_argument("--video", help="video file to replay")
+    parser.add_argument("--max-frames", type=int, default=100)
+    parser.add_argument("--output", help="write JSON results to this file")
+    parser.add_argument("--compare", help="JSON results of an earlier run to compare against")
+    args = parser.parse_args()
+
+    results = {
+        "commit": git_commit(),
+        "created_at": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "config": {
+            "GALLERY_BACKEND": config.GALLERY_BACKEND,
+            "DETECTION_SCALE": config.DETECTION_SCALE,
+            "DETECTION_MODEL": config.DETECTION_MODEL,
+        },
+        "galleries": {},
+    }
+    with tempfile.TemporaryDirectory(prefix="bench_") as workdir:
+        for size in args.sizes:
+            results["galleries"][str(size)] = bench_gallery(
+                size, args.queries, args.load_repeats, os.path.join(workdir, f"gallery_{size}.db"))
+            print(f"gallery {size}: {json.dumps(results['galleries'][str(size)], indent=1)}")
+        results["attendance"] = bench_attendance(args.marks, os.path.join(workdir, "attendance.db"))
+    if args.frames or args.video:
+        results["frames"] = bench_frames(read_frames(args.frames, args.video, args.max_frames))
+
+    print(json.dumps({k: v for k, v in results.items() if k != "galleries"}, indent=1))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=1)
+    if args.compare:
+        with open(args.compare) as f:
+            compare(results, json.load(f))
@@ -0,0 +1,17 @@
+import numpy as np
+
+
+def synthetic_gallery(size, dim=128, seed=0):
+    """Clustered random encodings roughly shaped like dlib face descriptors."""
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(scale=0.15, size=(max(size // 50, 1), dim))
+    encodings = centers[rng.integers(len(centers), size=size)]
+    encodings += rng.normal(scale=0.05, size=(size, dim))
+    return encodings.astype(np.float32)
+
+
+def noisy_queries(encodings, count, scale=0.02, seed=1):
+    """Queries close to random gallery rows, like a second photo of a known student."""
+    rng = np.random.default_rng(seed)
+    picks = rng.integers(len(encodings), size=count)
+    return encodings[picks] + rng.normal(scale=scale, size=(count, encodings.shape[1])).astype(np.float32)
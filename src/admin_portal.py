@@ -1,15 +1,87 @@
 from PyQt6.QtWidgets import *
 from PyQt6.QtCore import *
-from database import Database
-from datetime import datetime
+from datetime import datetime, time, timedelta
 import numpy as np  # Add this import if not already present
-import cv2
-import face_recognition
+import config
+from burst import DeviceBurst
+
+
+class AttendanceModel(QAbstractTableModel):
+    """
+    Attendance marks fetched a page at a time as the view scrolls.
+    Pages are keyed on the (timestamp, id) of the last loaded row, and the
+    filters are applied by the database.
+    """
+    HEADERS = ["Student", "Subject", "Date", "Time"]
+
+    def __init__(self, db, page_size=200, parent=None):
+        super().__init__(parent)
+        self.db = db
+        self.page_size = page_size
+        self.filters = {}
+        self._rows = []  # (id, name, subject, timestamp)
+        self._exhausted = False
+
+    def set_filters(self, **filters):
+        """Drop the loaded rows and start again from the newest matching mark."""
+        self.beginResetModel()
+        self.filters = filters
+        self._rows = []
+        self._exhausted = False
+        self.endResetModel()
+        if self.canFetchMore(QModelIndex()):
+            self.fetchMore(QModelIndex())
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self._rows)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.HEADERS)
+
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        if role != Qt.ItemDataRole.DisplayRole or not index.isValid():
+            return None
+        mark_id, name, subject, timestamp = self._rows[index.row()]
+        column = index.column()
+        if column == 0:
+            return name
+        if column == 1:
+            return subject
+        if column == 2:
+            return timestamp.strftime("%Y-%m-%d")
+        return timestamp.strftime("%H:%M")
+
+    def headerData(self, section, orientation, role=Qt.ItemDataRole.DisplayRole):
+        if role == Qt.ItemDataRole.DisplayRole and orientation == Qt.Orientation.Horizontal:
+            return self.HEADERS[section]
+        return None
+
+    def canFetchMore(self, parent):
+        return not parent.isValid() and not self._exhausted
+
+    def fetchMore(self, parent):
+        if parent.isValid():
+            return
+        before = None
+        if self._rows:
+            last_id, _, _, last_timestamp = self._rows[-1]
+            before = (last_timestamp, last_id)
+        page = self.db.fetch_attendance_page(self.page_size, before, **self.filters)
+        if len(page) < self.page_size:
+            self._exhausted = True
+        if page:
+            self.beginInsertRows(QModelIndex(), len(self._rows), len(self._rows) + len(page) - 1)
+            self._rows.extend(page)
+            self.endInsertRows()
+
 
 class AdminPortal(QMainWindow):
-    def __init__(self, db):
+    def __init__(self, db, gallery=None, schedule=None):
         super().__init__()
         self.db = db  # Use the passed Database instance
+        self.gallery = gallery  # Resident gallery to update when students are added
+        self.schedule = schedule  # Class schedule index to refresh when classes are added
+        self.burst = None  # Enrollment burst being captured, if any
         self.setWindowTitle("Admin Portal")
         self.setGeometry(200, 200, 800, 600)
         
@@ -25,11 +97,14 @@ class AdminPortal(QMainWindow):
         self.date_input = QDateEdit(calendarPopup=True)
         self.start_time = QTimeEdit()
         self.end_time = QTimeEdit()
+        self.room_input = QLineEdit()
+        self.room_input.setPlaceholderText("Optional, leave empty for all cameras")
         
         schedule_layout.addRow("Subject:", self.subject_input)
         schedule_layout.addRow("Date:", self.date_input)
         schedule_layout.addRow("Start Time:", self.start_time)
         schedule_layout.addRow("End Time:", self.end_time)
+        schedule_layout.addRow("Room:", self.room_input)
         
         schedule_btn = QPushButton("Schedule Class")
         schedule_btn.clicked.connect(self.schedule_class)
@@ -39,11 +114,46 @@ class AdminPortal(QMainWindow):
         layout.addWidget(schedule_group)
         
         # Attendance View
-        self.attendance_table = QTableWidget()
-        self.attendance_table.setColumnCount(4)
-        self.attendance_table.setHorizontalHeaderLabels(["Student", "Subject", "Date", "Time"])
-        layout.addWidget(self.attendance_table)
+        filter_layout = QHBoxLayout()
+        self.date_filter = QCheckBox("From")
+        self.from_date = QDateEdit(QDate.currentDate().addDays(-30), calendarPopup=True)
+        self.to_date = QDateEdit(QDate.currentDate(), calendarPopup=True)
+        self.class_filter = QComboBox()
+        self.student_filter = QLineEdit()
+        self.student_filter.setPlaceholderText("Student name")
+        self.student_filter.returnPressed.connect(self.load_attendance)
+        filter_btn = QPushButton("Filter")
+        filter_btn.clicked.connect(self.load_attendance)
+        
+        filter_layout.addWidget(self.date_filter)
+        filter_layout.addWidget(self.from_date)
+        filter_layout.addWidget(QLabel("To"))
+        filter_layout.addWidget(self.to_date)
+        filter_layout.addWidget(self.class_filter)
+        filter_layout.addWidget(self.student_filter)
+        filter_layout.addWidget(filter_btn)
+        layout.addLayout(filter_layout)
+        
+        self.attendance_model = AttendanceModel(self.db, parent=self)
+        self.attendance_table = QTableView()
+        self.attendance_table.setModel(self.attendance_model)
+        self.attendance_table.verticalHeader().setVisible(False)
+        
+        # Totals read from the summary tables, one row per class-day or student
+        self.class_summary_table = QTableWidget()
+        self.class_summary_table.setColumnCount(5)
+        self.class_summary_table.setHorizontalHeaderLabels(["Subject", "Date", "Present", "First", "Last"])
+        self.student_summary_table = QTableWidget()
+        self.student_summary_table.setColumnCount(3)
+        self.student_summary_table.setHorizontalHeaderLabels(["Student", "Days Present", "Classes Attended"])
+        
+        attendance_tabs = QTabWidget()
+        attendance_tabs.addTab(self.attendance_table, "Marks")
+        attendance_tabs.addTab(self.class_summary_table, "By Class")
+        attendance_tabs.addTab(self.student_summary_table, "By Student")
+        layout.addWidget(attendance_tabs)
         
+        self.load_classes()
         self.load_attendance()
         
         # Optional: Add Student Management
@@ -53,9 +163,27 @@ class AdminPortal(QMainWindow):
         self.student_name_input = QLineEdit()
         student_layout.addRow("Name:", self.student_name_input)
         
-        add_student_btn = QPushButton("Add Student")
-        add_student_btn.clicked.connect(self.add_student)
-        student_layout.addRow(add_student_btn)
+        self.add_student_btn = QPushButton("Add Student")
+        self.add_student_btn.clicked.connect(self.add_student)
+        student_layout.addRow(self.add_student_btn)
+        
+        # Face samples of an existing student
+        self.sample_student_input = QSpinBox()
+        self.sample_student_input.setRange(1, 2**31 - 1)
+        self.sample_list = QListWidget()
+        show_samples_btn = QPushButton("Show Samples")
+        show_samples_btn.clicked.connect(self.load_samples)
+        self.add_samples_btn = QPushButton("Capture More Samples")
+        self.add_samples_btn.clicked.connect(self.add_samples)
+        remove_sample_btn = QPushButton("Remove Selected Sample")
+        remove_sample_btn.clicked.connect(self.remove_sample)
+        sample_buttons = QHBoxLayout()
+        sample_buttons.addWidget(show_samples_btn)
+        sample_buttons.addWidget(self.add_samples_btn)
+        sample_buttons.addWidget(remove_sample_btn)
+        student_layout.addRow("Student ID:", self.sample_student_input)
+        student_layout.addRow(sample_buttons)
+        student_layout.addRow(self.sample_list)
         
         student_group.setLayout(student_layout)
         layout.addWidget(student_group)
@@ -65,6 +193,7 @@ class AdminPortal(QMainWindow):
         date = self.date_input.date().toPyDate()
         start = self.start_time.time().toPyTime()
         end = self.end_time.time().toPyTime()
+        room = self.room_input.text().strip() or None
         
         start_datetime = datetime.combine(date, start)
         end_datetime = datetime.combine(date, end)
@@ -73,31 +202,61 @@ class AdminPortal(QMainWindow):
             QMessageBox.warning(self, "Error", "End time must be after start time.")
             return
         
-        self.db.cursor.execute("""
-            INSERT INTO classes (subject, start_time, end_time)
-            VALUES (%s, %s, %s)
-        """, (subject, start_datetime, end_datetime))
-        self.db.connection.commit()
+        if self.db.insert_class(subject, start_datetime, end_datetime, room) is None:
+            QMessageBox.warning(self, "Error", "Failed to schedule class.")
+            return
+        if self.schedule is not None:
+            self.schedule.refresh()
         
         QMessageBox.information(self, "Success", "Class scheduled successfully!")
-        self.load_attendance()
+        self.load_classes()
+        
+    def load_classes(self):
+        """Fill the class filter with the most recently scheduled classes."""
+        selected = self.class_filter.currentData()
+        self.class_filter.clear()
+        self.class_filter.addItem("All classes", None)
+        for class_id, subject, start_time in self.db.fetch_class_list():
+            self.class_filter.addItem(f"{subject} ({start_time:%Y-%m-%d %H:%M})", class_id)
+        index = self.class_filter.findData(selected)
+        self.class_filter.setCurrentIndex(max(index, 0))
         
     def load_attendance(self):
-        self.db.cursor.execute("""
-            SELECT s.name, c.subject, a.timestamp
-            FROM attendance a
-            JOIN students s ON a.student_id = s.id
-            JOIN classes c ON a.class_id = c.id
-            ORDER BY a.timestamp DESC
-        """)
-        records = self.db.cursor.fetchall()
-        
-        self.attendance_table.setRowCount(len(records))
-        for i, record in enumerate(records):
-            self.attendance_table.setItem(i, 0, QTableWidgetItem(record[0]))
-            self.attendance_table.setItem(i, 1, QTableWidgetItem(record[1]))
-            self.attendance_table.setItem(i, 2, QTableWidgetItem(record[2].strftime("%Y-%m-%d")))
-            self.attendance_table.setItem(i, 3, QTableWidgetItem(record[2].strftime("%H:%M")))
+        """Reload the attendance view with the current filters, newest marks first."""
+        since = until = None
+        if self.date_filter.isChecked():
+            since = datetime.combine(self.from_date.date().toPyDate(), time.min)
+            until = datetime.combine(self.to_date.date().toPyDate() + timedelta(days=1), time.min)
+        self.attendance_model.set_filters(
+            since=since,
+            until=until,
+            class_id=self.class_filter.currentData(),
+            student_name=self.student_filter.text().strip() or None,
+        )
+        self.load_summaries()
+        
+    def load_summaries(self):
+        """Fill the per-class and per-student totals for the selected date range."""
+        since = until = None
+        if self.date_filter.isChecked():
+            since = self.from_date.date().toPyDate()
+            until = self.to_date.date().toPyDate()
+        
+        classes = self.db.fetch_class_summaries(since, until, limit=500)
+        self.class_summary_table.setRowCount(len(classes))
+        for i, (class_id, subject, day, present, first_mark, last_mark) in enumerate(classes):
+            self.class_summary_table.setItem(i, 0, QTableWidgetItem(subject))
+            self.class_summary_table.setItem(i, 1, QTableWidgetItem(day.strftime("%Y-%m-%d")))
+            self.class_summary_table.setItem(i, 2, QTableWidgetItem(str(present)))
+            self.class_summary_table.setItem(i, 3, QTableWidgetItem(first_mark.strftime("%H:%M")))
+            self.class_summary_table.setItem(i, 4, QTableWidgetItem(last_mark.strftime("%H:%M")))
+        
+        students = self.db.fetch_student_summaries(since, until)
+        self.student_summary_table.setRowCount(len(students))
+        for i, (student_id, name, days, classes_attended) in enumerate(students):
+            self.student_summary_table.setItem(i, 0, QTableWidgetItem(name))
+            self.student_summary_table.setItem(i, 1, QTableWidgetItem(str(days)))
+            self.student_summary_table.setItem(i, 2, QTableWidgetItem(str(classes_attended)))
 
     def add_student(self):
         name = self.student_name_input.text().strip()
@@ -105,42 +264,76 @@ class AdminPortal(QMainWindow):
             QMessageBox.warning(self, "Error", "Please enter a valid name.")
             return
         
-        # Capture a face encoding properly instead of using zeros
-        # This requires implementing a method to get the face encoding, possibly from a captured image
-        success, face_encoding = self.capture_face_encoding()  # Implement this method
-        if not success:
-            QMessageBox.warning(self, "Error", "Failed to capture face encoding.")
-            return
-        
-        success = self.db.insert_student(name, face_encoding)
-        if success:
-            QMessageBox.information(self, "Success", f"Student '{name}' added successfully.")
+        self.capture_face_encodings(lambda face_encodings: self.store_student(name, face_encodings))
+    
+    def store_student(self, name, face_encodings):
+        student_id = self.db.insert_student(name, face_encodings)
+        if student_id:
+            if self.gallery is not None:
+                self.gallery.refresh(self.db)
+            QMessageBox.information(
+                self, "Success",
+                f"Student '{name}' added with ID {student_id} and {len(face_encodings)} face samples."
+            )
             self.student_name_input.clear()
-            self.load_attendance()
         else:
             QMessageBox.warning(self, "Error", "Failed to add student.")
     
-    def capture_face_encoding(self):
+    def load_samples(self):
+        student_id = self.sample_student_input.value()
+        self.sample_list.clear()
+        for sample_id, created_at in self.db.fetch_student_samples(student_id):
+            item = QListWidgetItem(f"Sample {sample_id} - {created_at}")
+            item.setData(Qt.ItemDataRole.UserRole, sample_id)
+            self.sample_list.addItem(item)
+    
+    def add_samples(self):
+        student_id = self.sample_student_input.value()
+        self.capture_face_encodings(lambda face_encodings: self.store_samples(student_id, face_encodings))
+    
+    def store_samples(self, student_id, face_encodings):
+        if self.db.add_face_encodings(student_id, face_encodings) is None:
+            QMessageBox.warning(self, "Error", "Failed to add face samples.")
+            return
+        if self.gallery is not None:
+            self.gallery.refresh(self.db)
+        self.load_samples()
+    
+    def remove_sample(self):
+        item = self.sample_list.currentItem()
+        if item is None:
+            return
+        sample_id = item.data(Qt.ItemDataRole.UserRole)
+        if not self.db.delete_face_encoding(sample_id):
+            QMessageBox.warning(self, "Error", "Could not remove the sample; a student keeps at least one.")
+            return
+        if self.gallery is not None:
+            self.gallery.remove_sample(sample_id)
+        self.load_samples()
+    
+    def capture_face_encodings(self, on_captured):
         """
-        Captures a single frame from the camera and returns the face encoding.
-        Returns:
-            (bool, np.ndarray): Success status and the face encoding.
+        Captures a short burst of frames from the camera on a worker thread
+        and encodes the face in each frame that shows exactly one. Calls
+        on_captured with the encodings when there are enough of them.
         """
-        cap = cv2.VideoCapture(0)
-        if not cap.isOpened():
-            return False, None
-        
-        ret, frame = cap.read()
-        cap.release()
-        
-        if not ret:
-            return False, None
-        
-        rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-        face_locations = face_recognition.face_locations(rgb_frame)
-        face_encodings = face_recognition.face_encodings(rgb_frame, face_locations)
-        
-        if len(face_encodings) != 1:
-            return False, None
-        
-        return True, face_encodings[0]
\ No newline at end of file
+        self.add_student_btn.setEnabled(False)
+        self.add_samples_btn.setEnabled(False)
+        self.burst = DeviceBurst(0)
+        self.burst.captured.connect(lambda face_encodings: self.on_burst_captured(face_encodings, on_captured))
+        self.burst.start()
+    
+    def on_burst_captured(self, face_encodings, on_captured):
+        self.burst.wait()
+        self.burst = None
+        self.add_student_btn.setEnabled(True)
+        self.add_samples_btn.setEnabled(True)
+        if len(face_encodings) < config.ENROLL_MIN_SAMPLES:
+            QMessageBox.warning(self, "Error", "Failed to capture face encodings.")
+            return
+        on_captured(face_encodings)
+    
+    def closeEvent(self, event):
+        if self.burst is not None:
+            self.burst.wait()
+        super().closeEvent(event)
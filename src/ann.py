@@ -0,0 +1,97 @@
+import numpy as np
+
+
+def _squared_distances(queries, points, point_sq_norms=None):
+    """Squared Euclidean distances between every query and every point."""
+    if point_sq_norms is None:
+        point_sq_norms = np.einsum("ij,ij->i", points, points)
+    sq = (
+        np.einsum("ij,ij->i", queries, queries)[:, None]
+        + point_sq_norms[None, :]
+        - 2.0 * queries @ points.T
+    )
+    np.maximum(sq, 0.0, out=sq)
+    return sq
+
+
+def kmeans(data, k, iterations=10, seed=0, chunk_size=8192):
+    """
+    Plain Lloyd's k-means in NumPy.
+    Returns the centroids and the cluster assignment of every row.
+    """
+    rng = np.random.default_rng(seed)
+    centroids = data[rng.choice(len(data), size=k, replace=False)].copy()
+    assignments = np.empty(len(data), dtype=np.int64)
+
+    for _ in range(iterations):
+        centroid_sq_norms = np.einsum("ij,ij->i", centroids, centroids)
+        for start in range(0, len(data), chunk_size):
+            chunk = data[start:start + chunk_size]
+            sq = _squared_distances(chunk, centroids, centroid_sq_norms)
+            assignments[start:start + chunk_size] = np.argmin(sq, axis=1)
+
+        counts = np.bincount(assignments, minlength=k)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assignments, data)
+        non_empty = counts > 0
+        centroids[non_empty] = sums[non_empty] / counts[non_empty, None]
+
+        # Re-seed empty buckets from random rows so every bucket stays useful
+        empty = np.flatnonzero(~non_empty)
+        if len(empty):
+            centroids[empty] = data[rng.choice(len(data), size=len(empty), replace=False)]
+
+    return centroids, assignments
+
+
+class IVFIndex:
+    """
+    Inverted-file index over gallery rows.
+    Rows are bucketed by their nearest k-means centroid; a query only scans
+    the rows in its nprobe closest buckets.
+    """
+
+    def __init__(self, nlist=0, nprobe=8, iterations=10):
+        self.nlist = nlist
+        self.nprobe = nprobe
+        self.iterations = iterations
+        self.centroids = None
+        self.trained_size = 0
+        self._lists = []
+        self._arrays = {}
+
+    @property
+    def is_trained(self):
+        return self.centroids is not None
+
+    def train(self, encodings):
+        """Cluster the current gallery and bucket every row."""
+        n = len(encodings)
+        nlist = self.nlist or int(4 * np.sqrt(n))
+        nlist = max(1, min(nlist, n))
+        self.centroids, assignments = kmeans(encodings, nlist, self.iterations)
+        order = np.argsort(assignments, kind="stable")
+        bounds = np.searchsorted(assignments[order], np.arange(nlist + 1))
+        self._lists = [list(order[bounds[i]:bounds[i + 1]]) for i in range(nlist)]
+        self._arrays = {}
+        self.trained_size = n
+
+    def add(self, row, encoding):
+        """Assign a newly appended gallery row to its nearest bucket."""
+        bucket = int(np.argmin(np.sum((self.centroids - encoding) ** 2, axis=1)))
+        self._lists[bucket].append(row)
+        self._arrays.pop(bucket, None)
+
+    def _bucket(self, bucket):
+        rows = self._arrays.get(bucket)
+        if rows is None:
+            rows = np.asarray(self._lists[bucket], dtype=np.int64)
+            self._arrays[bucket] = rows
+        return rows
+
+    def candidates(self, queries):
+        """Row indices to scan for each query, one array per query."""
+        nprobe = min(self.nprobe, len(self.centroids))
+        sq = _squared_distances(queries, self.centroids)
+        probes = np.argpartition(sq, nprobe - 1, axis=1)[:, :nprobe]
+        return [np.concatenate([self._bucket(b) for b in row]) for row in probes]
@@ -0,0 +1,85 @@
+import threading
+import time
+import config
+from metrics import METRICS
+from storage import StorageError
+
+
+class AttendanceWriter:
+    """
+    Batched, deduplicated attendance sink.
+    Marks already recorded for (student_id, class_id, date) are dropped in
+    memory; new marks are buffered and written with one executemany per
+    flush. The unique key on attendance rejects anything that slips through.
+    """
+
+    def __init__(self, db, flush_interval=None, batch_size=None):
+        self.db = db
+        self.flush_interval = flush_interval or config.ATTENDANCE_FLUSH_SECONDS
+        self.batch_size = batch_size or config.ATTENDANCE_BATCH_SIZE
+        self._seen = set()
+        self._warmed = set()
+        self._pending = []
+        self._last_flush = time.monotonic()
+        self._lock = threading.Lock()
+
+    def warm(self, class_id, attendance_date):
+        """
+        Load the marks already in the database for a class and day.
+        If they cannot be read, the key is tried again on the next mark and
+        the unique key on attendance drops any duplicates queued meanwhile.
+        """
+        key = (class_id, attendance_date)
+        with self._lock:
+            if key in self._warmed:
+                return
+            self._warmed.add(key)
+            # Forget earlier days so the seen-set stays bounded
+            self._seen = {mark for mark in self._seen if mark[2] == attendance_date}
+            self._warmed = {k for k in self._warmed if k[1] == attendance_date}
+        try:
+            student_ids = self.db.fetch_attendance_marks(class_id, attendance_date)
+        except StorageError as err:
+            print(f"Could not load existing attendance marks: {err}")
+            with self._lock:
+                self._warmed.discard(key)
+            return
+        with self._lock:
+            self._seen.update((student_id, class_id, attendance_date) for student_id in student_ids)
+
+    def mark(self, student_id, class_id, timestamp):
+        """
+        Queue an attendance mark. Returns False if the student was already
+        marked for this class today.
+        """
+        self.warm(class_id, timestamp.date())
+        key = (student_id, class_id, timestamp.date())
+        with self._lock:
+            if key in self._seen:
+                return False
+            self._seen.add(key)
+            self._pending.append((student_id, class_id, timestamp))
+            full = len(self._pending) >= self.batch_size
+        if full:
+            self.flush()
+        return True
+
+    def flush_if_due(self):
+        if time.monotonic() - self._last_flush >= self.flush_interval:
+            self.flush()
+
+    def flush(self):
+        """Write all buffered marks in a single transaction."""
+        with self._lock:
+            pending, self._pending = self._pending, []
+            self._last_flush = time.monotonic()
+        if not pending:
+            return True
+        with METRICS.timer("attendance_flush"):
+            ok = self.db.insert_attendance_batch(pending)
+        if not ok:
+            # Keep the marks for the next flush
+            with self._lock:
+                self._pending = pending + self._pending
+            return False
+        return True
@@ -0,0 +1,203 @@
+"""
+Headless recognition over recorded video files.
+
+    python src/batch_video.py lecture1.mp4 lecture2.mp4 --sample-fps 2 --output attendance.csv
+    python src/batch_video.py lecture.mp4 --start-time "2026-10-01 09:00" --record
+    python src/batch_video.py mon.mp4 tue.mp4 --start-time "2026-10-05 09:00" --start-time "2026-10-06 09:00"
+
+Files are split into time segments processed in parallel. Every worker maps
+the same gallery snapshot instead of loading its own copy. Event times come
+from the video position, offset by the recording start time (given with
+one --start-time per file, in order, otherwise the file's modification
+time minus its duration).
+Each student is reported once per class they were seen in, at their first
+sighting during that class, so a recording spanning several lectures
+back-fills every one of them.
+"""
+import argparse
+import csv
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta
+
+import cv2
+
+import config
+from attendance import AttendanceWriter
+from storage import create_database, StorageError
+from face_recognition_module import find_faces
+from gallery import GalleryIndex
+from schedule import ClassSchedule
+
+
+def video_info(path):
+    """(fps, duration in seconds) of a video file."""
+    capture = cv2.VideoCapture(path)
+    fps = capture.get(cv2.CAP_PROP_FPS) or 30.0
+    frame_count = capture.get(cv2.CAP_PROP_FRAME_COUNT)
+    capture.release()
+    return fps, frame_count / fps
+
+
+def process_segment(path, start, end, sample_fps, snapshot_dir):
+    """
+    Runs in a worker process: recognize faces in sampled frames between
+    start and end seconds. Returns (events, frames processed, CPU seconds)
+    where events are (position in seconds, student_id).
+    """
+    cpu_start = time.process_time()
+    gallery = GalleryIndex.from_snapshot(snapshot_dir)
+    capture = cv2.VideoCapture(path)
+    fps = capture.get(cv2.CAP_PROP_FPS) or 30.0
+    step = max(int(round(fps / sample_fps)), 1)
+
+    frame_index = int(start * fps)
+    capture.set(cv2.CAP_PROP_POS_FRAMES, frame_index)
+    events, processed = [], 0
+    while frame_index < end * fps:
+        # grab() skips decoding work for frames that are not sampled
+        if frame_index % step:
+            if not capture.grab():
+                break
+            frame_index += 1
+            continue
+        ret, frame = capture.read()
+        if not ret:
+            break
+        processed += 1
+        for location, student_id, name in find_faces(frame, gallery):
+            if student_id is not None:
+                events.append((frame_index / fps, student_id))
+        frame_index += 1
+
+    capture.release()
+    return events, processed, time.process_time() - cpu_start
+
+
+def plan_segments(paths, segment_seconds):
+    """Split each file into (path, start, end) jobs."""
+    jobs = []
+    for path in paths:
+        fps, duration = video_info(path)
+        if not segment_seconds:
+            jobs.append((path, 0.0, duration))
+            continue
+        start = 0.0
+        while start < duration:
+            jobs.append((path, start, min(start + segment_seconds, duration)))
+            start += segment_seconds
+    return jobs
+
+
+def recording_start(path, start_time):
+    if start_time is not None:
+        return start_time
+    fps, duration = video_info(path)
+    return datetime.fromtimestamp(os.path.getmtime(path)) - timedelta(seconds=duration)
+
+
+def run(paths, sample_fps, workers, segment_seconds, starts, snapshot_dir, schedule=None, room=None):
+    """
+    Recognize every file and return the first sighting of each student per
+    (file, active class) as sorted (path, position, timestamp, student_id,
+    class_id) rows. starts maps each path to its recording start; class_id
+    is None without a schedule or outside scheduled classes.
+    """
+    jobs = plan_segments(paths, segment_seconds)
+    print(f"{len(paths)} files, {len(jobs)} segments")
+
+    wall_start = time.monotonic()
+    first_seen = {}
+    frames = 0
+    cpu_seconds = 0.0
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(process_segment, path, start, end, sample_fps, snapshot_dir)
+                   for path, start, end in jobs]
+        for (path, start, end), future in zip(jobs, futures):
+            events, processed, cpu = future.result()
+            frames += processed
+            cpu_seconds += cpu
+            for position, student_id in events:
+                # Resolve the class before deduplicating, so back-to-back lectures each get a sighting
+                timestamp = starts[path] + timedelta(seconds=position)
+                class_id = schedule.active_class_id(timestamp, room) if schedule is not None else None
+                key = (path, student_id, class_id)
+                if key not in first_seen or position < first_seen[key][0]:
+                    first_seen[key] = (position, timestamp)
+            print(f"{path} [{start:.0f}s-{end:.0f}s]: {processed} frames, "
+                  f"{processed / cpu if cpu else 0:.2f} frames/s per core")
+
+    wall = time.monotonic() - wall_start
+    print(f"Total: {frames} frames in {wall:.1f}s, {frames / wall:.2f} frames/s overall, "
+          f"{frames / cpu_seconds if cpu_seconds else 0:.2f} frames/s per core")
+
+    return sorted(
+        (path, position, timestamp, student_id, class_id)
+        for (path, student_id, class_id), (position, timestamp) in first_seen.items()
+    )
+
+
+def record(db, sightings):
+    """Back-fill attendance for sightings made during a scheduled class."""
+    writer = AttendanceWriter(db)
+    marked = 0
+    for path, position, timestamp, student_id, class_id in sightings:
+        if class_id is not None and writer.mark(student_id, class_id, timestamp):
+            marked += 1
+    writer.flush()
+    return marked
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Recognize faces in recorded videos and back-fill attendance.")
+    parser.add_argument("videos", nargs="+")
+    parser.add_argument("--sample-fps", type=float, default=2.0, help="frames analysed per second of video")
+    parser.add_argument("--workers", type=int, default=None, help="worker processes (default: CPU count)")
+    parser.add_argument("--segment-seconds", type=float, default=600,
+                        help="split files into segments of this length, 0 to process whole files")
+    parser.add_argument("--start-time", type=datetime.fromisoformat, action="append", default=None,
+                        help="wall-clock start of a recording, e.g. '2026-10-01 09:00'; "
+                             "give one per video, in the same order")
+    parser.add_argument("--output", help="write first sightings to this CSV file")
+    parser.add_argument("--record", action="store_true", help="write attendance to the database")
+    parser.add_argument("--room", default=config.CAMERA_ROOM, help="room the videos were recorded in")
+    args = parser.parse_args()
+    if args.start_time is not None and len(args.start_time) != len(args.videos):
+        parser.error(f"got {len(args.start_time)} --start-time values for {len(args.videos)} videos; "
+                     "give one per video or none")
+    start_times = args.start_time or [None] * len(args.videos)
+
+    try:
+        db = create_database()
+    except StorageError as err:
+        print(err)
+        sys.exit(1)
+    # Workers map one shared snapshot instead of each fetching the gallery
+    snapshot_dir = config.SNAPSHOT_DIR or tempfile.mkdtemp(prefix="gallery_")
+    gallery = GalleryIndex.load(db, snapshot_dir)
+    gallery.save_snapshot(snapshot_dir)
+
+    starts = {path: recording_start(path, start_time) for path, start_time in zip(args.videos, start_times)}
+    schedule = ClassSchedule(db)
+    schedule.refresh(now=min(starts.values()))
+
+    sightings = run(args.videos, args.sample_fps, args.workers, args.segment_seconds,
+                    starts, snapshot_dir, schedule, args.room)
+
+    if args.output:
+        with open(args.output, "w", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(["video", "position_seconds", "timestamp", "student_id", "class_id"])
+            for path, position, timestamp, student_id, class_id in sightings:
+                writer.writerow([path, f"{position:.2f}", timestamp.isoformat(sep=" "), student_id,
+                                 "" if class_id is None else class_id])
+    else:
+        for path, position, timestamp, student_id, class_id in sightings:
+            print(f"{path}\t{position:.2f}\t{timestamp}\t{student_id}\t{class_id}")
+
+    if args.record:
+        print(f"Recorded {record(db, sightings)} attendance marks.")
+    db.close()
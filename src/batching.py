@@ -0,0 +1,125 @@
+import threading
+import time
+
+import dlib
+from face_recognition import api as face_api
+
+import config
+
+
+class _Request:
+    def __init__(self, rgb_frame, locations):
+        self.rgb_frame = rgb_frame
+        self.locations = locations
+        self.matches = None
+        self.error = None
+        self.done = threading.Event()
+
+
+class EncodingBatcher:
+    """
+    Micro-batches face encoding and matching across frames and cameras.
+    Workers submit (frame, face locations) and block; a batching thread
+    waits up to max_wait_ms for more faces, computes landmarks and encodings
+    for the whole batch in one dlib call and matches every encoding against
+    the gallery in one matrix operation.
+    """
+
+    def __init__(self, gallery, max_batch_size=None, max_wait_ms=None):
+        self.gallery = gallery
+        self.max_batch_size = max_batch_size or config.ENCODING_BATCH_SIZE
+        self.max_wait = (config.ENCODING_BATCH_WAIT_MS if max_wait_ms is None else max_wait_ms) / 1000.0
+        self._queue = []
+        self._condition = threading.Condition()
+        self._running = True
+        self._thread = threading.Thread(target=self._run, name="encoding-batcher", daemon=True)
+        self._thread.start()
+
+    def submit(self, rgb_frame, locations):
+        """Encode and match the faces at locations; returns gallery.match results."""
+        if not locations:
+            return []
+        request = _Request(rgb_frame, locations)
+        with self._condition:
+            self._queue.append(request)
+            self._condition.notify_all()
+        request.done.wait()
+        if request.error is not None:
+            raise request.error
+        return request.matches
+
+    def stop(self):
+        with self._condition:
+            self._running = False
+            self._condition.notify_all()
+        self._thread.join()
+
+    def _faces_queued(self):
+        return sum(len(request.locations) for request in self._queue)
+
+    def _take_batch(self):
+        with self._condition:
+            self._condition.wait_for(lambda: self._queue or not self._running)
+            if not self._queue:
+                return []
+            # Give other workers a few ms to add their faces to this batch
+            deadline = time.monotonic() + self.max_wait
+            while self._faces_queued() < self.max_batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0 or not self._condition.wait(remaining):
+                    break
+
+            batch, faces = [], 0
+            while self._queue and (not batch or faces + len(self._queue[0].locations) <= self.max_batch_size):
+                request = self._queue.pop(0)
+                batch.append(request)
+                faces += len(request.locations)
+            return batch
+
+    def _run(self):
+        while True:
+            batch = self._take_batch()
+            if not batch:
+                return
+            try:
+                encodings = self._encode(batch)
+                matches = self.gallery.match(encodings)
+                start = 0
+                for request in batch:
+                    request.matches = matches[start:start + len(request.locations)]
+                    start += len(request.locations)
+            except Exception as err:
+                for request in batch:
+                    request.error = err
+            for request in batch:
+                request.done.set()
+
+    @staticmethod
+    def _encode(batch):
+        return batch_face_encodings([request.rgb_frame for request in batch],
+                                    [request.locations for request in batch])
+
+
+def batch_face_encodings(rgb_frames, locations):
+    """
+    Encodings of the faces at locations[i] in rgb_frames[i], in order.
+    Landmarks come from the 5-point predictor, like the default of
+    face_recognition.face_encodings used for enrollment, so batched and
+    unbatched encodings of a face are identical. Descriptors for all frames
+    are computed in one dlib call.
+    """
+    images, shapes = [], []
+    for rgb_frame, frame_locations in zip(rgb_frames, locations):
+        landmarks = dlib.full_object_detections()
+        for shape in face_api._raw_face_landmarks(rgb_frame, frame_locations, model="small"):
+            landmarks.append(shape)
+        images.append(rgb_frame)
+        shapes.append(landmarks)
+    try:
+        descriptors = face_api.face_encoder.compute_face_descriptor(images, shapes, 1)
+    except TypeError:
+        # dlib builds without the batch overload: fall back to one call per frame
+        descriptors = [d for image, faces in zip(images, shapes)
+                       for d in face_api.face_encoder.compute_face_descriptor(image, faces, 1)]
+        return [list(d) for d in descriptors]
+    return [list(d) for per_image in descriptors for d in per_image]
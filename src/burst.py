@@ -0,0 +1,83 @@
+import cv2
+from PyQt6.QtCore import QThread, pyqtSignal
+
+import config
+from face_recognition_module import encode_single_faces
+
+
+class BurstCapture(QThread):
+    """
+    Captures an enrollment burst and encodes it off the GUI thread.
+    Frames are taken ENROLL_BURST_INTERVAL apart, so each sample sees a
+    slightly different pose; `captured` carries the encodings of the frames
+    that show exactly one face. Subclasses supply the frames.
+    """
+    captured = pyqtSignal(object)
+
+    def __init__(self, frame_count=None, parent=None):
+        super().__init__(parent)
+        self.frame_count = frame_count or config.ENROLL_BURST_FRAMES
+
+    def open(self):
+        return True
+
+    def read_frame(self):
+        """The next frame, or None when the source has nothing more."""
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+    def run(self):
+        frames = []
+        try:
+            if self.open():
+                for i in range(self.frame_count):
+                    if i:
+                        self.msleep(int(config.ENROLL_BURST_INTERVAL * 1000))
+                    frame = self.read_frame()
+                    if frame is None:
+                        break
+                    frames.append(frame)
+            face_encodings = encode_single_faces(frames)
+        except Exception as err:
+            print(f"Enrollment burst failed: {err!r}")
+            face_encodings = []
+        finally:
+            self.close()
+        self.captured.emit(face_encodings)
+
+
+class GrabberBurst(BurstCapture):
+    """Burst from a running FrameGrabber, starting after frame after_seq."""
+
+    def __init__(self, grabber, after_seq=0, frame_count=None, parent=None):
+        super().__init__(frame_count, parent)
+        self.grabber = grabber
+        self.seq = after_seq
+
+    def read_frame(self):
+        self.seq, frame = self.grabber.latest(after_seq=self.seq, timeout=1.0)
+        return frame
+
+
+class DeviceBurst(BurstCapture):
+    """Burst from a camera device that is opened for the burst only."""
+
+    def __init__(self, device=0, frame_count=None, parent=None):
+        super().__init__(frame_count, parent)
+        self.device = device
+        self.capture = None
+
+    def open(self):
+        self.capture = cv2.VideoCapture(self.device)
+        return self.capture.isOpened()
+
+    def read_frame(self):
+        ret, frame = self.capture.read()
+        return frame if ret else None
+
+    def close(self):
+        if self.capture is not None:
+            self.capture.release()
+            self.capture = None
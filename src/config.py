@@ -0,0 +1,106 @@
+# Runtime configuration for the face recognition system
+import os
+
+# Maximum face distance for a gallery match
+MATCH_TOLERANCE = 0.6
+
+# Gallery search backend: "exact" (vectorized brute force) or "ivf"
+# (k-means buckets with exact re-ranking of the probed candidates)
+GALLERY_BACKEND = "exact"
+
+# Students whose full sample sets are compared with a query after the
+# first pass over per-student templates (mean encodings)
+GALLERY_SHORTLIST = 5
+
+# IVF settings, only used when GALLERY_BACKEND = "ivf"
+IVF_MIN_GALLERY_SIZE = 10000  # Below this the exact search is used anyway
+IVF_NLIST = 0                 # Number of buckets, 0 picks ~4 * sqrt(n)
+IVF_NPROBE = 8                # Buckets searched per query
+IVF_TRAIN_ITERATIONS = 10
+
+# Storage format for new face encoding blobs: "float32" or "int8"
+ENCODING_FORMAT = "float32"
+
+# Enrollment captures a short burst of frames and stores one sample per usable frame
+ENROLL_BURST_FRAMES = 5
+ENROLL_BURST_INTERVAL = 0.2    # Seconds between burst frames
+ENROLL_MIN_SAMPLES = 2         # Fewer usable frames than this fails the enrollment
+
+# Directory of the memory-mapped gallery snapshot, None to always load from the database
+SNAPSHOT_DIR = "gallery_snapshot"
+# Rewrite the snapshot at startup once this many samples were added or removed since it
+SNAPSHOT_REFRESH_ROWS = 1000
+
+# Face tracking between detection keyframes
+DETECT_EVERY_N_FRAMES = 5      # Full detection on every Nth processed frame
+IDENTITY_TTL_SECONDS = 10.0    # Re-encode a recognized track after this long
+UNKNOWN_RETRY_SECONDS = 1.0    # Re-encode an unrecognized track after this long
+TRACK_IOU_THRESHOLD = 0.3
+TRACK_MAX_MISSES = 2           # Keyframes a track may go undetected before it is dropped
+TRACKER_OPTICAL_FLOW = True    # Carry boxes between keyframes with sparse optical flow
+TRACKER_FLOW_SCALE = 0.5       # Optical flow runs on a downscaled grayscale frame
+
+# Motion gate in front of detection
+MOTION_GATE = True             # Skip recognition while the scene is unchanged
+MOTION_WIDTH = 160             # Width of the grayscale image frames are compared at
+MOTION_PIXEL_THRESHOLD = 25    # Grey-level change that counts a pixel as changed
+MOTION_MIN_AREA = 0.002        # Fraction of changed pixels (within the ROIs) that counts as motion
+MOTION_ROIS = None             # Regions to watch as (x, y, width, height) fractions of the frame, None for all of it
+MOTION_FORCE_SECONDS = 5.0     # Run a full pass at least this often, even without motion
+
+# Liveness check on tracked faces before they are reported.
+# While a recognized face has not passed yet, every frame goes through
+# recognition even with MOTION_GATE on: blinks are only visible between
+# consecutive frames, not between the gate's forced passes.
+LIVENESS_ENABLED = True
+LIVENESS_CROP_SIZE = 64         # Face crops are compared at this size (pixels, square)
+LIVENESS_WINDOW = 30            # Frames of cues kept per face
+LIVENESS_MIN_FRAMES = 5         # Frames a face must be seen before it can pass
+LIVENESS_MIN_SHARPNESS = 15.0   # Median Laplacian variance; replayed or printed faces tend to be blurry
+LIVENESS_MIN_CONTRAST = 12.0    # Median grey-level standard deviation of the crop (texture)
+LIVENESS_MIN_CHANGE = 3.0       # Mean grey-level change in the eye band that counts as a blink or movement
+LIVENESS_BLINK_RATIO = 1.5      # Eye-band change must exceed the lower face's change by this factor
+LIVENESS_MIN_BLINKS = 1         # Eye-band changes needed within the window
+
+# Face detection
+DETECTION_SCALE = 0.5      # Detect on a resized copy; encodings still use full resolution
+DETECTION_MODEL = "hog"    # "hog" (CPU) or "cnn" (slower, needs a GPU build of dlib to be practical)
+DETECTION_UPSAMPLE = 1     # Times to upsample the detection image to find smaller faces
+MIN_FACE_SIZE = 40         # Faces smaller than this (full-resolution pixels) are skipped
+
+# Attendance writes are buffered and flushed in one transaction
+ATTENDANCE_FLUSH_SECONDS = 2.0
+ATTENDANCE_BATCH_SIZE = 50
+
+# Class schedule index
+SCHEDULE_REFRESH_SECONDS = 60.0  # Picks up classes scheduled from other kiosks
+CAMERA_ROOM = None               # Room of this kiosk's camera, None matches every class
+
+# Database connection pool
+DB_POOL_SIZE = 5
+DB_POOL_TIMEOUT = 5.0  # Seconds to wait for a free pooled connection
+
+# Multi-camera engine
+CAMERA_TARGET_FPS = 5.0  # Recognition passes per second per camera
+ENGINE_WORKERS = 2       # Recognition worker threads shared by all cameras
+
+# Cross-camera micro-batching of face encodings (multi-camera engine)
+ENCODING_BATCH_SIZE = 16     # Max faces per batch, 1 disables batching
+ENCODING_BATCH_WAIT_MS = 5   # Max time to wait for more faces before encoding
+
+# Instrumentation (stage latencies and counters)
+METRICS_ENABLED = False
+METRICS_OVERLAY = False        # Draw FPS and stage latencies on the video feed
+METRICS_HTTP_PORT = None       # e.g. 9108 to serve http://127.0.0.1:9108/metrics
+METRICS_FILE = None            # e.g. "metrics.txt" to rewrite a plain-text file periodically
+METRICS_FILE_SECONDS = 10.0
+METRICS_RATE_SECONDS = 5.0     # Window the overlay's live fps figures are measured over
+
+# Storage backend: "mysql" (shared server) or "sqlite" (embedded, for self-contained kiosks)
+DB_BACKEND = os.environ.get("FACE_DB_BACKEND", "mysql")
+SQLITE_PATH = os.environ.get("FACE_SQLITE_PATH", "face_recognition.db")
+MYSQL_HOST = os.environ.get("FACE_MYSQL_HOST", "localhost")
+MYSQL_PORT = int(os.environ.get("FACE_MYSQL_PORT", "3306"))
+MYSQL_USER = os.environ.get("FACE_MYSQL_USER", "root")
+MYSQL_PASSWORD = os.environ.get("FACE_MYSQL_PASSWORD", "vaiditya@2501")
+MYSQL_DATABASE = os.environ.get("FACE_MYSQL_DATABASE", "test")
@@ -1,114 +1,686 @@
+import time
+from contextlib import contextmanager
 import mysql.connector
-from mysql.connector import errorcode
+from mysql.connector import errorcode, pooling
 import numpy as np
+import config
+from metrics import METRICS
+from storage import Storage, StorageError, date_range, encoding_list, page_filters, placeholders, summary_keys
+from utils import encode_face_encoding, decode_face_encoding, is_legacy_blob
 
-class Database:
-    def __init__(self):
-        self.host = "localhost"
-        self.port = 3306
-        self.user = "root"
-        self.password = "vaiditya@2501"
-        self.database = "test"
-        self.connection = None
-        self.cursor = None
+class Database(Storage):
+    """
+    MySQL storage backend, accessed through a connection pool.
+    Every call checks a connection out for the duration of one cursor, so
+    recognition workers, the admin portal and the attendance writer can use
+    the same Database object from different threads. Pooled connections run
+    in autocommit mode and are not reset on return, so a read costs one
+    round trip; writes open an explicit transaction.
+    """
+    def __init__(self, pool_size=None):
+        self.host = config.MYSQL_HOST
+        self.port = config.MYSQL_PORT
+        self.user = config.MYSQL_USER
+        self.password = config.MYSQL_PASSWORD
+        self.database = config.MYSQL_DATABASE
+        self.pool_size = pool_size or config.DB_POOL_SIZE
+        self.pool = None
         self.connect_database()
         self.create_tables()
     
     def connect_database(self):
         try:
             # Connect without specifying the database to create it if it doesn't exist
-            self.connection = mysql.connector.connect(
+            connection = mysql.connector.connect(
                 host=self.host,
                 user=self.user,
                 password=self.password,
                 port=self.port
             )
-            self.cursor = self.connection.cursor()
-            self.cursor.execute(f"CREATE DATABASE IF NOT EXISTS {self.database}")
-            self.connection.database = self.database
-            self.cursor.close()
-            self.connection.close()
+            cursor = connection.cursor()
+            cursor.execute(f"CREATE DATABASE IF NOT EXISTS {self.database}")
+            cursor.close()
+            connection.close()
             
-            # Reconnect to the specific database
-            self.connection = mysql.connector.connect(
+            # Pool connections to the specific database
+            self.pool = pooling.MySQLConnectionPool(
+                pool_name=f"face_recognition_{id(self)}",
+                pool_size=self.pool_size,
                 host=self.host,
                 user=self.user,
                 password=self.password,
-                database=self.database
+                port=self.port,
+                database=self.database,
+                autocommit=True,
+                # The session is never changed, so skip the reset round trip on every return
+                pool_reset_session=False
             )
-            self.cursor = self.connection.cursor()
         except mysql.connector.Error as err:
             if err.errno == errorcode.ER_ACCESS_DENIED_ERROR:
-                print("Something is wrong with your user name or password")
-            else:
-                print(err)
-            exit(1)
+                raise StorageError("Something is wrong with your user name or password") from err
+            raise StorageError(str(err)) from err
+    
+    def _get_connection(self):
+        """
+        Check a connection out of the pool, waiting if it is exhausted.
+        The pool pings each connection on checkout and reopens it if the
+        server dropped it.
+        """
+        deadline = time.monotonic() + config.DB_POOL_TIMEOUT
+        while True:
+            try:
+                connection = self.pool.get_connection()
+                break
+            except pooling.PoolError:
+                if time.monotonic() >= deadline:
+                    raise
+                time.sleep(0.01)
+        return connection
+    
+    @contextmanager
+    def _cursor(self, stage="db_other", readonly=False):
+        """
+        Cursor on a pooled connection. Unless readonly, the block runs in a
+        transaction committed when it exits cleanly and rolled back
+        otherwise; reads run as single autocommitted statements. The round
+        trip is timed under `stage` when metrics are enabled.
+        """
+        with METRICS.timer(stage):
+            connection = self._get_connection()
+            cursor = connection.cursor()
+            try:
+                if readonly:
+                    yield cursor
+                else:
+                    connection.start_transaction()
+                    yield cursor
+                    connection.commit()
+            except Exception:
+                if not readonly:
+                    connection.rollback()
+                raise
+            finally:
+                cursor.close()
+                connection.close()  # Returns the connection to the pool
     
     def create_tables(self):
         try:
-            self.cursor.execute("""
-                CREATE TABLE IF NOT EXISTS students (
-                    id INT AUTO_INCREMENT PRIMARY KEY,
-                    name VARCHAR(100),
-                    face_encoding BLOB,
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-                )
-            """)
-            
-            self.cursor.execute("""
-                CREATE TABLE IF NOT EXISTS classes (
-                    id INT AUTO_INCREMENT PRIMARY KEY,
-                    subject VARCHAR(100),
-                    start_time DATETIME,
-                    end_time DATETIME,
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-                )
-            """)
-            
-            self.cursor.execute("""
-                CREATE TABLE IF NOT EXISTS attendance (
-                    id INT AUTO_INCREMENT PRIMARY KEY,
-                    student_id INT,
-                    class_id INT,
-                    timestamp DATETIME,
-                    FOREIGN KEY (student_id) REFERENCES students(id),
-                    FOREIGN KEY (class_id) REFERENCES classes(id)
-                )
-            """)
-            self.connection.commit()
-        except mysql.connector.Error as err:
-            print(f"Failed creating tables: {err}")
-            exit(1)
-    
-    def insert_student(self, name, face_encoding):
-        try:
-            face_encoding_blob = face_encoding.tobytes()
-            self.cursor.execute("""
-                INSERT INTO students (name, face_encoding)
-                VALUES (%s, %s)
-            """, (name, face_encoding_blob))
-            self.connection.commit()
-            return True
+            with self._cursor() as cursor:
+                cursor.execute("""
+                    CREATE TABLE IF NOT EXISTS students (
+                        id INT AUTO_INCREMENT PRIMARY KEY,
+                        name VARCHAR(100),
+                        face_encoding BLOB,
+                        enrollment_key CHAR(40) NULL,
+                        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                        UNIQUE KEY uq_enrollment_key (enrollment_key),
+                        KEY idx_students_name (name)
+                    )
+                """)
+                
+                # Every encoding sample of a student; students.face_encoding keeps their mean
+                cursor.execute("""
+                    CREATE TABLE IF NOT EXISTS face_encodings (
+                        id INT AUTO_INCREMENT PRIMARY KEY,
+                        student_id INT NOT NULL,
+                        face_encoding BLOB,
+                        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                        KEY idx_face_encodings_student (student_id),
+                        FOREIGN KEY (student_id) REFERENCES students(id) ON DELETE CASCADE
+                    )
+                """)
+                
+                cursor.execute("""
+                    CREATE TABLE IF NOT EXISTS classes (
+                        id INT AUTO_INCREMENT PRIMARY KEY,
+                        subject VARCHAR(100),
+                        start_time DATETIME,
+                        end_time DATETIME,
+                        room VARCHAR(50) NULL,
+                        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                    )
+                """)
+                
+                cursor.execute("""
+                    CREATE TABLE IF NOT EXISTS attendance (
+                        id INT AUTO_INCREMENT PRIMARY KEY,
+                        student_id INT,
+                        class_id INT,
+                        timestamp DATETIME,
+                        attendance_date DATE,
+                        UNIQUE KEY uq_attendance_mark (student_id, class_id, attendance_date),
+                        KEY idx_attendance_timestamp (timestamp, id),
+                        KEY idx_attendance_class_timestamp (class_id, timestamp),
+                        KEY idx_attendance_class_date (class_id, attendance_date),
+                        KEY idx_attendance_student_date (student_id, attendance_date),
+                        FOREIGN KEY (student_id) REFERENCES students(id),
+                        FOREIGN KEY (class_id) REFERENCES classes(id)
+                    )
+                """)
+                
+                # Summaries kept up to date by insert_attendance_batch
+                cursor.execute("""
+                    CREATE TABLE IF NOT EXISTS class_attendance_summary (
+                        class_id INT,
+                        attendance_date DATE,
+                        present_count INT NOT NULL,
+                        first_mark DATETIME,
+                        last_mark DATETIME,
+                        PRIMARY KEY (class_id, attendance_date),
+                        KEY idx_class_summary_date (attendance_date)
+                    )
+                """)
+                
+                cursor.execute("""
+                    CREATE TABLE IF NOT EXISTS student_attendance_daily (
+                        student_id INT,
+                        attendance_date DATE,
+                        classes_attended INT NOT NULL,
+                        PRIMARY KEY (student_id, attendance_date),
+                        KEY idx_student_daily_date (attendance_date)
+                    )
+                """)
+                self.migrate_students(cursor)
+                self.migrate_face_encodings(cursor)
+                self.migrate_attendance(cursor)
+                self.migrate_classes(cursor)
+                self.migrate_indexes(cursor)
+                self.migrate_summaries(cursor)
+        except mysql.connector.Error as err:
+            raise StorageError(f"Failed creating tables: {err}") from err
+    
+    def _column_exists(self, cursor, table, column):
+        cursor.execute("""
+            SELECT COUNT(*) FROM information_schema.COLUMNS
+            WHERE TABLE_SCHEMA = %s AND TABLE_NAME = %s AND COLUMN_NAME = %s
+        """, (self.database, table, column))
+        return cursor.fetchone()[0] > 0
+    
+    def _index_exists(self, cursor, table, index):
+        cursor.execute("""
+            SELECT COUNT(*) FROM information_schema.STATISTICS
+            WHERE TABLE_SCHEMA = %s AND TABLE_NAME = %s AND INDEX_NAME = %s
+        """, (self.database, table, index))
+        return cursor.fetchone()[0] > 0
+    
+    def migrate_students(self, cursor):
+        """Add the enrollment_key column used by bulk enrollment to older tables."""
+        if self._column_exists(cursor, "students", "enrollment_key"):
+            return
+        cursor.execute("ALTER TABLE students ADD COLUMN enrollment_key CHAR(40) NULL")
+        cursor.execute("ALTER TABLE students ADD UNIQUE KEY uq_enrollment_key (enrollment_key)")
+    
+    def migrate_face_encodings(self, cursor):
+        """
+        Give every student without samples their students.face_encoding as
+        the first sample. Covers tables from before multi-sample enrollment
+        and students added by older clients.
+        """
+        self._copy_student_encodings(cursor)
+    
+    def _copy_student_encodings(self, cursor, after_id=0):
+        """Seed samples for students above after_id that have none."""
+        cursor.execute("""
+            INSERT INTO face_encodings (student_id, face_encoding)
+            SELECT s.id, s.face_encoding FROM students s
+            WHERE s.id > %s AND s.face_encoding IS NOT NULL
+              AND NOT EXISTS (SELECT 1 FROM face_encodings f WHERE f.student_id = s.id)
+            ORDER BY s.id
+        """, (after_id,))
+    
+    def migrate_attendance(self, cursor):
+        """
+        Add the attendance_date column and the unique mark key to attendance
+        tables created before they existed. Duplicate marks are collapsed to
+        the earliest row first so the key can be created.
+        """
+        if self._column_exists(cursor, "attendance", "attendance_date"):
+            return
+        cursor.execute("ALTER TABLE attendance ADD COLUMN attendance_date DATE")
+        cursor.execute("UPDATE attendance SET attendance_date = DATE(timestamp)")
+        cursor.execute("""
+            DELETE a FROM attendance a
+            JOIN attendance b
+              ON a.student_id = b.student_id AND a.class_id = b.class_id
+             AND a.attendance_date = b.attendance_date AND a.id > b.id
+        """)
+        cursor.execute("""
+            ALTER TABLE attendance
+            ADD UNIQUE KEY uq_attendance_mark (student_id, class_id, attendance_date)
+        """)
+    
+    def migrate_classes(self, cursor):
+        """Add the room column to classes tables created before it existed."""
+        if self._column_exists(cursor, "classes", "room"):
+            return
+        cursor.execute("ALTER TABLE classes ADD COLUMN room VARCHAR(50) NULL")
+    
+    def migrate_indexes(self, cursor):
+        """Add the indexes used by the paginated attendance view to older tables."""
+        indexes = [
+            ("students", "idx_students_name", "(name)"),
+            ("attendance", "idx_attendance_timestamp", "(timestamp, id)"),
+            ("attendance", "idx_attendance_class_timestamp", "(class_id, timestamp)"),
+            ("attendance", "idx_attendance_class_date", "(class_id, attendance_date)"),
+            ("attendance", "idx_attendance_student_date", "(student_id, attendance_date)"),
+        ]
+        for table, index, columns in indexes:
+            if not self._index_exists(cursor, table, index):
+                cursor.execute(f"ALTER TABLE {table} ADD KEY {index} {columns}")
+    
+    def migrate_summaries(self, cursor):
+        """Backfill the summary tables the first time they are created next to existing attendance."""
+        cursor.execute("SELECT EXISTS (SELECT 1 FROM attendance), EXISTS (SELECT 1 FROM class_attendance_summary)")
+        has_attendance, has_summaries = cursor.fetchone()
+        if has_attendance and not has_summaries:
+            self._rebuild_summaries(cursor)
+    
+    def insert_student(self, name, face_encodings):
+        """
+        Insert a student with one or more face encoding samples and return
+        the new student id, or None on failure. students.face_encoding holds
+        the mean of the samples.
+        """
+        samples = encoding_list(face_encodings)
+        try:
+            with self._cursor() as cursor:
+                cursor.execute("""
+                    INSERT INTO students (name, face_encoding)
+                    VALUES (%s, %s)
+                """, (name, encode_face_encoding(np.mean(samples, axis=0))))
+                student_id = cursor.lastrowid
+                self._insert_samples(cursor, student_id, samples)
+                return student_id
         except mysql.connector.Error as err:
             print(f"Error inserting student: {err}")
+            return None
+    
+    def _insert_samples(self, cursor, student_id, samples):
+        sample_ids = []
+        for face_encoding in samples:
+            cursor.execute("""
+                INSERT INTO face_encodings (student_id, face_encoding)
+                VALUES (%s, %s)
+            """, (student_id, encode_face_encoding(face_encoding)))
+            sample_ids.append(cursor.lastrowid)
+        return sample_ids
+    
+    def _update_mean(self, cursor, student_id):
+        """Reset students.face_encoding to the mean of the student's samples."""
+        cursor.execute("SELECT face_encoding FROM face_encodings WHERE student_id = %s", (student_id,))
+        samples = [decode_face_encoding(bytes(row[0])) for row in cursor.fetchall()]
+        if samples:
+            cursor.execute("""
+                UPDATE students SET face_encoding = %s WHERE id = %s
+            """, (encode_face_encoding(np.mean(samples, axis=0)), student_id))
+    
+    def add_face_encodings(self, student_id, face_encodings):
+        """Add samples to an existing student; returns the new sample ids, or None on failure."""
+        try:
+            with self._cursor() as cursor:
+                sample_ids = self._insert_samples(cursor, student_id, encoding_list(face_encodings))
+                self._update_mean(cursor, student_id)
+                return sample_ids
+        except mysql.connector.Error as err:
+            print(f"Error adding face encodings: {err}")
+            return None
+    
+    def delete_face_encoding(self, sample_id):
+        """
+        Remove one sample; returns True if it existed. A student's last
+        sample is kept so they can still be recognized.
+        """
+        try:
+            with self._cursor() as cursor:
+                cursor.execute("""
+                    SELECT f.student_id, COUNT(*) FROM face_encodings f
+                    JOIN face_encodings o ON o.student_id = f.student_id
+                    WHERE f.id = %s GROUP BY f.student_id
+                """, (sample_id,))
+                row = cursor.fetchone()
+                if row is None:
+                    return False
+                student_id, samples = row
+                if samples < 2:
+                    print("Cannot delete a student's last face sample.")
+                    return False
+                cursor.execute("DELETE FROM face_encodings WHERE id = %s", (sample_id,))
+                self._update_mean(cursor, student_id)
+                return True
+        except mysql.connector.Error as err:
+            print(f"Error deleting face encoding: {err}")
             return False
     
-    def fetch_students(self):
+    def fetch_face_encodings(self, since_id=0):
+        """(sample_id, student_id, name, face_encoding) rows with a sample id above since_id."""
+        try:
+            with self._cursor(stage="db_fetch_students", readonly=True) as cursor:
+                cursor.execute("""
+                    SELECT f.id, f.student_id, s.name, f.face_encoding
+                    FROM face_encodings f
+                    JOIN students s ON f.student_id = s.id
+                    WHERE f.id > %s ORDER BY f.id
+                """, (since_id,))
+                records = cursor.fetchall()
+            return [
+                (sample_id, student_id, name, decode_face_encoding(bytes(blob)))
+                for sample_id, student_id, name, blob in records
+            ]
+        except mysql.connector.Error as err:
+            print(f"Error fetching face encodings: {err}")
+            return []
+    
+    def fetch_face_encoding_ids(self):
+        """
+        Ids of every stored sample.
+        Raises StorageError when the server cannot be reached.
+        """
+        try:
+            with self._cursor(readonly=True) as cursor:
+                cursor.execute("SELECT id FROM face_encodings")
+                return {row[0] for row in cursor.fetchall()}
+        except mysql.connector.Error as err:
+            raise StorageError(f"Error fetching sample ids: {err}") from err
+    
+    def fetch_student_samples(self, student_id):
+        """(sample_id, created_at) of a student's samples, oldest first."""
+        try:
+            with self._cursor(readonly=True) as cursor:
+                cursor.execute("""
+                    SELECT id, created_at FROM face_encodings
+                    WHERE student_id = %s ORDER BY id
+                """, (student_id,))
+                return cursor.fetchall()
+        except mysql.connector.Error as err:
+            print(f"Error fetching samples: {err}")
+            return []
+    
+    def insert_students_batch(self, students):
+        """
+        Insert (name, face_encoding, enrollment_key) rows in one transaction.
+        Rows whose enrollment_key already exists are skipped, which makes
+        re-running an interrupted enrollment safe. Each new student gets
+        their encoding as the first sample. Returns the number of rows
+        inserted, or None on failure.
+        """
+        rows = [(name, encode_face_encoding(face_encoding), key) for name, face_encoding, key in students]
+        if not rows:
+            return 0
+        try:
+            with self._cursor() as cursor:
+                cursor.execute("SELECT COALESCE(MAX(id), 0) FROM students")
+                after_id = cursor.fetchone()[0]
+                cursor.executemany("""
+                    INSERT IGNORE INTO students (name, face_encoding, enrollment_key)
+                    VALUES (%s, %s, %s)
+                """, rows)
+                inserted = cursor.rowcount
+                self._copy_student_encodings(cursor, after_id)
+                return inserted
+        except mysql.connector.Error as err:
+            print(f"Error inserting students: {err}")
+            return None
+    
+    def fetch_enrollment_keys(self):
+        """
+        Enrollment keys of every student added by bulk enrollment.
+        Raises StorageError when the server cannot be reached.
+        """
         try:
-            self.cursor.execute("SELECT id, name, face_encoding FROM students")
-            records = self.cursor.fetchall()
+            with self._cursor(readonly=True) as cursor:
+                cursor.execute("SELECT enrollment_key FROM students WHERE enrollment_key IS NOT NULL")
+                return {row[0] for row in cursor.fetchall()}
+        except mysql.connector.Error as err:
+            raise StorageError(f"Error fetching enrollment keys: {err}") from err
+    
+    def fetch_students(self, since_id=0):
+        """Fetch (id, name, face_encoding) rows with an id above since_id."""
+        try:
+            with self._cursor(stage="db_fetch_students", readonly=True) as cursor:
+                cursor.execute("""
+                    SELECT id, name, face_encoding FROM students
+                    WHERE id > %s ORDER BY id
+                """, (since_id,))
+                records = cursor.fetchall()
             
             students = []
             for record in records:
                 student_id = record[0]
                 name = record[1]
-                face_encoding = np.frombuffer(record[2], dtype=np.float64)
+                face_encoding = decode_face_encoding(bytes(record[2]))
                 students.append((student_id, name, face_encoding))
             return students
         except mysql.connector.Error as err:
             print(f"Error fetching students: {err}")
             return []
     
+    def insert_class(self, subject, start_time, end_time, room=None):
+        """Schedule a class and return its id, or None on failure."""
+        try:
+            with self._cursor() as cursor:
+                cursor.execute("""
+                    INSERT INTO classes (subject, start_time, end_time, room)
+                    VALUES (%s, %s, %s, %s)
+                """, (subject, start_time, end_time, room))
+                return cursor.lastrowid
+        except mysql.connector.Error as err:
+            print(f"Error scheduling class: {err}")
+            return None
+    
+    def fetch_classes(self, ending_after):
+        """
+        (id, subject, start_time, end_time, room) for classes not yet over.
+        Raises StorageError when the server cannot be reached.
+        """
+        try:
+            with self._cursor(stage="db_fetch_classes", readonly=True) as cursor:
+                cursor.execute("""
+                    SELECT id, subject, start_time, end_time, room FROM classes
+                    WHERE end_time > %s
+                """, (ending_after,))
+                return cursor.fetchall()
+        except mysql.connector.Error as err:
+            raise StorageError(f"Error fetching classes: {err}") from err
+    
+    def fetch_attendance_marks(self, class_id, attendance_date):
+        """
+        Student ids already marked present for a class on a date.
+        Raises StorageError when the server cannot be reached.
+        """
+        try:
+            with self._cursor(stage="db_attendance_marks", readonly=True) as cursor:
+                cursor.execute("""
+                    SELECT student_id FROM attendance
+                    WHERE class_id = %s AND attendance_date = %s
+                """, (class_id, attendance_date))
+                return {row[0] for row in cursor.fetchall()}
+        except mysql.connector.Error as err:
+            raise StorageError(f"Error fetching attendance marks: {err}") from err
+    
+    def insert_attendance_batch(self, marks):
+        """
+        Insert (student_id, class_id, timestamp) marks in one transaction.
+        Marks already present for the same class and day are ignored by the
+        unique key. The summary rows for the touched classes, students and
+        days are recomputed in the same transaction. Returns True on success.
+        """
+        if not marks:
+            return True
+        try:
+            # A plain cursor lets executemany send a single multi-row INSERT
+            with self._cursor(stage="db_attendance_write") as cursor:
+                cursor.executemany("""
+                    INSERT IGNORE INTO attendance (student_id, class_id, timestamp, attendance_date)
+                    VALUES (%s, %s, %s, %s)
+                """, [(student_id, class_id, timestamp, timestamp.date()) for student_id, class_id, timestamp in marks])
+                self._refresh_summaries(cursor, *summary_keys(marks))
+            return True
+        except mysql.connector.Error as err:
+            print(f"Error recording attendance: {err}")
+            return False
+    
+    def _refresh_summaries(self, cursor, class_ids, student_ids, dates):
+        """
+        Recompute the summary rows for the given keys from attendance.
+        Each key is read through an (id, attendance_date) index, so the cost
+        depends on the batch, not on how much history is stored.
+        """
+        days = placeholders(len(dates), "%s")
+        cursor.execute(f"""
+            INSERT INTO class_attendance_summary (class_id, attendance_date, present_count, first_mark, last_mark)
+            SELECT * FROM (
+                SELECT class_id, attendance_date, COUNT(*) AS present_count,
+                       MIN(timestamp) AS first_mark, MAX(timestamp) AS last_mark
+                FROM attendance
+                WHERE class_id IN ({placeholders(len(class_ids), "%s")}) AND attendance_date IN ({days})
+                GROUP BY class_id, attendance_date
+            ) AS fresh
+            ON DUPLICATE KEY UPDATE present_count = fresh.present_count,
+                first_mark = fresh.first_mark, last_mark = fresh.last_mark
+        """, class_ids + dates)
+        cursor.execute(f"""
+            INSERT INTO student_attendance_daily (student_id, attendance_date, classes_attended)
+            SELECT * FROM (
+                SELECT student_id, attendance_date, COUNT(*) AS classes_attended
+                FROM attendance
+                WHERE student_id IN ({placeholders(len(student_ids), "%s")}) AND attendance_date IN ({days})
+                GROUP BY student_id, attendance_date
+            ) AS fresh
+            ON DUPLICATE KEY UPDATE classes_attended = fresh.classes_attended
+        """, student_ids + dates)
+    
+    def _rebuild_summaries(self, cursor):
+        cursor.execute("DELETE FROM class_attendance_summary")
+        cursor.execute("""
+            INSERT INTO class_attendance_summary (class_id, attendance_date, present_count, first_mark, last_mark)
+            SELECT class_id, attendance_date, COUNT(*), MIN(timestamp), MAX(timestamp)
+            FROM attendance GROUP BY class_id, attendance_date
+        """)
+        rows = cursor.rowcount
+        cursor.execute("DELETE FROM student_attendance_daily")
+        cursor.execute("""
+            INSERT INTO student_attendance_daily (student_id, attendance_date, classes_attended)
+            SELECT student_id, attendance_date, COUNT(*)
+            FROM attendance GROUP BY student_id, attendance_date
+        """)
+        return rows
+    
+    def rebuild_attendance_summaries(self):
+        """
+        Recompute the summary tables from the attendance table, for
+        backfills. Returns the number of class-day rows written.
+        """
+        with self._cursor() as cursor:
+            return self._rebuild_summaries(cursor)
+    
+    def fetch_class_summaries(self, since=None, until=None, limit=None):
+        """
+        (class_id, subject, attendance_date, present_count, first_mark,
+        last_mark) per class and day, newest first.
+        """
+        where, params = date_range("cs.attendance_date", since, until, "%s")
+        query = f"""
+            SELECT cs.class_id, c.subject, cs.attendance_date, cs.present_count, cs.first_mark, cs.last_mark
+            FROM class_attendance_summary cs
+            JOIN classes c ON cs.class_id = c.id
+            {where}
+            ORDER BY cs.attendance_date DESC, c.start_time DESC, cs.class_id DESC
+        """
+        if limit is not None:
+            query += " LIMIT %s"
+            params.append(limit)
+        try:
+            with self._cursor(stage="db_attendance_summary", readonly=True) as cursor:
+                cursor.execute(query, params)
+                return cursor.fetchall()
+        except mysql.connector.Error as err:
+            print(f"Error fetching class summaries: {err}")
+            return []
+    
+    def fetch_student_summaries(self, since=None, until=None):
+        """(student_id, name, days_present, classes_attended) per student, ordered by name."""
+        where, params = date_range("d.attendance_date", since, until, "%s")
+        try:
+            with self._cursor(stage="db_attendance_summary", readonly=True) as cursor:
+                cursor.execute(f"""
+                    SELECT d.student_id, s.name, COUNT(*), SUM(d.classes_attended)
+                    FROM student_attendance_daily d
+                    JOIN students s ON d.student_id = s.id
+                    {where}
+                    GROUP BY d.student_id, s.name
+                    ORDER BY s.name
+                """, params)
+                # SUM() comes back as a Decimal
+                return [(student_id, name, days, int(classes)) for student_id, name, days, classes in cursor.fetchall()]
+        except mysql.connector.Error as err:
+            print(f"Error fetching student summaries: {err}")
+            return []
+    
+    def fetch_attendance_page(self, limit, before=None, since=None, until=None, class_id=None, student_name=None):
+        """
+        One page of (id, student name, subject, timestamp) marks, newest
+        first. Pages are keyed on (timestamp, id) rather than OFFSET, so
+        every page costs the same however deep the view is scrolled.
+        """
+        where, params = page_filters(before, since, until, class_id, student_name, "%s")
+        try:
+            with self._cursor(stage="db_attendance_page", readonly=True) as cursor:
+                cursor.execute(f"""
+                    SELECT a.id, s.name, c.subject, a.timestamp
+                    FROM attendance a
+                    JOIN students s ON a.student_id = s.id
+                    JOIN classes c ON a.class_id = c.id
+                    {where}
+                    ORDER BY a.timestamp DESC, a.id DESC
+                    LIMIT %s
+                """, params + [limit])
+                return cursor.fetchall()
+        except mysql.connector.Error as err:
+            print(f"Error fetching attendance: {err}")
+            return []
+    
+    def fetch_class_list(self, limit=500):
+        """(id, subject, start_time) of the most recent classes, newest first."""
+        try:
+            with self._cursor(readonly=True) as cursor:
+                cursor.execute("""
+                    SELECT id, subject, start_time FROM classes
+                    ORDER BY start_time DESC LIMIT %s
+                """, (limit,))
+                return cursor.fetchall()
+        except mysql.connector.Error as err:
+            print(f"Error fetching classes: {err}")
+            return []
+    
+    def migrate_encodings(self, fmt=None, batch_size=500):
+        """
+        One-shot rewrite of legacy float64 encoding blobs to the versioned format.
+        Already migrated rows are left alone, so it is safe to re-run.
+        Returns the number of rows rewritten.
+        """
+        try:
+            migrated = 0
+            for table in ("students", "face_encodings"):
+                with self._cursor(readonly=True) as cursor:
+                    cursor.execute(f"SELECT id, face_encoding FROM {table}")
+                    records = cursor.fetchall()
+                
+                updates = [
+                    (encode_face_encoding(decode_face_encoding(blob), fmt), row_id)
+                    for row_id, blob in records
+                    if blob is not None and is_legacy_blob(blob)
+                ]
+                for start in range(0, len(updates), batch_size):
+                    with self._cursor() as cursor:
+                        cursor.executemany(f"""
+                            UPDATE {table} SET face_encoding = %s WHERE id = %s
+                        """, updates[start:start + batch_size])
+                migrated += len(updates)
+            return migrated
+        except mysql.connector.Error as err:
+            print(f"Error migrating encodings: {err}")
+            return 0
+    
     def close(self):
-        self.cursor.close()
-        self.connection.close()
\ No newline at end of file
+        # Pooled connections are closed as they are returned; nothing is held here
+        self.pool = None
\ No newline at end of file
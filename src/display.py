@@ -0,0 +1,51 @@
+import cv2
+import numpy as np
+from PyQt6.QtGui import QImage
+
+from face_recognition_module import annotate_frame
+
+
+class FrameRenderer:
+    """
+    Turns captured BGR frames into QImages for a fixed-size video widget.
+    Each frame is resized straight into one preallocated display buffer,
+    which is the only per-frame pixel copy. Annotations are drawn on that
+    buffer at display resolution, and the QImage wraps it as BGR888, so no
+    colour conversion is needed. The returned image shares the buffer and
+    is only valid until the next render().
+    """
+
+    def __init__(self, width, height):
+        self.width = width
+        self.height = height
+        self.scale = 1.0
+        self._source_shape = None
+        self._buffer = None
+
+    def _allocate(self, shape):
+        height, width = shape[:2]
+        # Fit the widget, but never upscale
+        self.scale = min(self.width / width, self.height / height, 1.0)
+        size = (max(int(width * self.scale), 1), max(int(height * self.scale), 1))
+        self._buffer = np.empty((size[1], size[0], 3), dtype=np.uint8)
+        self._source_shape = shape
+
+    def render(self, frame, results=(), overlay=None):
+        """
+        Render a BGR frame with the recognition results drawn on it.
+        overlay, if given, is called with the display buffer to draw extra
+        information in place.
+        """
+        if frame.shape != self._source_shape:
+            self._allocate(frame.shape)
+        buffer = self._buffer
+        height, width = buffer.shape[:2]
+        if buffer.shape == frame.shape:
+            np.copyto(buffer, frame)
+        else:
+            cv2.resize(frame, (width, height), dst=buffer, interpolation=cv2.INTER_LINEAR)
+
+        annotate_frame(buffer, results, self.scale)
+        if overlay is not None:
+            overlay(buffer)
+        return QImage(buffer.data, width, height, buffer.strides[0], QImage.Format.Format_BGR888)
@@ -0,0 +1,115 @@
+"""
+Bulk enrollment of students from ID photos.
+
+    python src/enroll.py photos/               # student name taken from the file name
+    python src/enroll.py manifest.csv          # CSV with "name,path" columns
+
+Encodings are computed in a process pool and written in batched
+transactions. Every photo is keyed by the SHA-1 of its contents, so an
+interrupted run can simply be started again without duplicating students.
+"""
+import argparse
+import csv
+import hashlib
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import face_recognition
+
+from storage import create_database, StorageError
+from face_recognition_module import detect_faces
+
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png")
+
+
+def file_key(path):
+    with open(path, "rb") as f:
+        return hashlib.sha1(f.read()).hexdigest()
+
+
+def list_photos(source):
+    """(name, path) pairs from a directory of photos or a CSV manifest."""
+    if os.path.isdir(source):
+        photos = []
+        for root, _, files in os.walk(source):
+            for filename in sorted(files):
+                if filename.lower().endswith(IMAGE_EXTENSIONS):
+                    name = os.path.splitext(filename)[0].replace("_", " ")
+                    photos.append((name, os.path.join(root, filename)))
+        return photos
+
+    base = os.path.dirname(os.path.abspath(source))
+    with open(source, newline="") as f:
+        return [(row["name"].strip(), os.path.join(base, row["path"].strip())) for row in csv.DictReader(f)]
+
+
+def encode_photo(path):
+    """
+    Runs in a worker process.
+    Returns (face_encoding, None) or (None, reason) when the photo is rejected.
+    """
+    try:
+        image = face_recognition.load_image_file(path)
+    except (OSError, ValueError) as err:
+        return None, f"unreadable ({err})"
+    face_locations = detect_faces(image)
+    if len(face_locations) != 1:
+        return None, f"{len(face_locations)} faces found"
+    return face_recognition.face_encodings(image, face_locations)[0], None
+
+
+def enroll(db, photos, workers=None, batch_size=200):
+    """Encode and insert photos, skipping ones enrolled by an earlier run."""
+    done = db.fetch_enrollment_keys()
+    todo = []
+    for name, path in photos:
+        key = file_key(path)
+        if key not in done:
+            todo.append((name, path, key))
+            done.add(key)  # Also skips duplicate photos within this run
+    print(f"{len(photos)} photos, {len(photos) - len(todo)} already enrolled, {len(todo)} to process")
+
+    inserted = rejected = processed = 0
+    pending = []
+    start = time.monotonic()
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        results = pool.map(encode_photo, [path for _, path, _ in todo], chunksize=8)
+        for (name, path, key), (face_encoding, reason) in zip(todo, results):
+            processed += 1
+            if face_encoding is None:
+                rejected += 1
+                print(f"Rejected {path}: {reason}", file=sys.stderr)
+            else:
+                pending.append((name, face_encoding, key))
+
+            if len(pending) >= batch_size or processed == len(todo):
+                if pending:
+                    count = db.insert_students_batch(pending)
+                    if count is None:
+                        raise RuntimeError("Database error during enrollment; re-run to resume.")
+                    inserted += count
+                    pending = []
+                elapsed = time.monotonic() - start
+                print(f"{processed}/{len(todo)} processed, {inserted} enrolled, {rejected} rejected, "
+                      f"{processed / elapsed:.1f} photos/s")
+
+    return inserted, rejected
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Enroll students from a directory of photos or a CSV manifest.")
+    parser.add_argument("source", help="directory of photos, or CSV manifest with name,path columns")
+    parser.add_argument("--workers", type=int, default=None, help="encoding processes (default: CPU count)")
+    parser.add_argument("--batch-size", type=int, default=200, help="students written per transaction")
+    args = parser.parse_args()
+
+    try:
+        db = create_database()
+        inserted, rejected = enroll(db, list_photos(args.source), args.workers, args.batch_size)
+    except StorageError as err:
+        print(err)
+        sys.exit(1)
+    print(f"Done: {inserted} students enrolled, {rejected} photos rejected.")
+    db.close()
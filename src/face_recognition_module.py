@@ -1,67 +1,215 @@
-import os
+import time
 import face_recognition
 import cv2
-import numpy as np
-from database import Database
-
-known_face_encodings = []
-known_face_names = []
+import config
+from gallery import GalleryIndex
+from tracker import FaceTracker
+from motion import MotionGate
+from liveness import LivenessChecker
+from metrics import METRICS
 
 def load_known_faces(db):
     """
-    Load and encode all known faces from the database.
+    Load all known faces into a resident gallery index, mapping the on-disk
+    snapshot when there is one and fetching only newer rows from the database.
+    """
+    with METRICS.timer("gallery_load"):
+        return GalleryIndex.load(db)
+
+def detect_faces(rgb_frame, scale=None, model=None, upsample=None, min_face_size=None, small_frame=None):
+    """
+    Detect faces on a resized copy of the frame and map the boxes back to
+    full-resolution (top, right, bottom, left) coordinates, so encodings can
+    still be computed from the original pixels. Faces smaller than
+    min_face_size pixels are dropped before they reach the encoder.
+    A caller that already has the frame resized by `scale` can pass it as
+    small_frame to skip the resize.
     """
-    db.cursor.execute("SELECT id, face_encoding FROM students")
-    records = db.cursor.fetchall()
+    scale = scale or config.DETECTION_SCALE
+    model = model or config.DETECTION_MODEL
+    upsample = config.DETECTION_UPSAMPLE if upsample is None else upsample
+    min_face_size = config.MIN_FACE_SIZE if min_face_size is None else min_face_size
     
-    known_face_encodings = []
-    known_face_ids = []
-    for record in records:
-        student_id = record[0]
-        encoding = np.frombuffer(record[1], dtype=np.float64)
-        known_face_encodings.append(encoding)
-        known_face_ids.append(student_id)
+    if small_frame is None and scale != 1.0:
+        small_frame = cv2.resize(rgb_frame, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+    elif small_frame is None:
+        small_frame = rgb_frame
+    face_locations = face_recognition.face_locations(small_frame, number_of_times_to_upsample=upsample, model=model)
     
-    return known_face_encodings, known_face_ids
-
-def check_liveness(frame):
-    """Check if the face is real using basic liveness detection"""
-    gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-    blur = cv2.Laplacian(gray, cv2.CV_64F).var()
-    return blur > 100  # Threshold for blur detection
+    height, width = rgb_frame.shape[:2]
+    locations = []
+    for top, right, bottom, left in face_locations:
+        top, right = max(int(top / scale), 0), min(int(right / scale), width)
+        bottom, left = min(int(bottom / scale), height), max(int(left / scale), 0)
+        if min(bottom - top, right - left) < min_face_size:
+            continue
+        locations.append((top, right, bottom, left))
+    return locations
 
-def recognize_faces(frame, db):
+def find_faces(frame, gallery):
     """
-    Detect and recognize faces in the given frame.
-    Returns the annotated frame and a list of recognized student IDs.
+    Detect and match faces in the given BGR frame without drawing on it.
+    Returns a list of (location, student_id, name); student_id is None for
+    faces that did not match anyone in the gallery.
+    Single frames carry no liveness cue, so no liveness check is made; live
+    cameras go through FaceRecognizer instead.
     """
     rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-    face_locations = face_recognition.face_locations(rgb_frame)
-    face_encodings = face_recognition.face_encodings(rgb_frame, face_locations)
-    
-    recognized_students = []
+    with METRICS.timer("detection"):
+        face_locations = detect_faces(rgb_frame)
+    with METRICS.timer("encoding"):
+        face_encodings = face_recognition.face_encodings(rgb_frame, face_locations)
     
-    known_face_encodings, known_face_ids = load_known_faces(db)
+    # One vectorized distance computation for every face in the frame
+    with METRICS.timer("matching"):
+        matches = gallery.match(face_encodings)
+    METRICS.count("faces_detected", len(face_locations))
+    METRICS.count("faces_matched", sum(student_id is not None for student_id, _ in matches))
     
-    for face_encoding in face_encodings:
-        matches = face_recognition.compare_faces(known_face_encodings, face_encoding)
-        face_distances = face_recognition.face_distance(known_face_encodings, face_encoding)
-        
-        if len(face_distances) == 0:
-            continue  # Skip if no known faces to compare
-        
-        best_match_index = np.argmin(face_distances)
-        
-        if matches[best_match_index]:
-            student_id = known_face_ids[best_match_index]
-            recognized_students.append((student_id, f"Student {student_id}"))
-    
-    # Annotate frame with rectangles and names
-    for (top, right, bottom, left), (student_id, name) in zip(face_locations, recognized_students):
+    results = []
+    for location, (student_id, distance) in zip(face_locations, matches):
+        name = f"Student {student_id}" if student_id is not None else None
+        results.append((location, student_id, name))
+    return results
+
+def annotate_frame(frame, results, scale=1.0):
+    """
+    Draw rectangles and names for the recognized faces in place.
+    Locations are multiplied by scale when the frame is a resized copy.
+    """
+    for location, student_id, name in results:
+        if student_id is None:
+            continue
+        top, right, bottom, left = (int(v * scale) for v in location)
         cv2.rectangle(frame, (left, top), (right, bottom), (0, 255, 0), 2)
         cv2.putText(frame, name, (left, top - 10), cv2.FONT_HERSHEY_SIMPLEX, 0.9, (0, 255, 0), 2)
-    
-    return frame, recognized_students
+    return frame
+
+class FaceRecognizer:
+    """
+    Stateful recognizer for a video stream.
+    Full detection runs every N frames (or as soon as a track is lost);
+    in between, tracked boxes carry their identity forward. A face is only
+    re-encoded when its track is new or its identity has expired.
+    With a batcher, encoding and matching are micro-batched with other streams.
+    With a motion gate, frames where nothing moved reuse the previous results.
+    With a liveness checker, a recognized face is only reported once its
+    track has passed the liveness check; the gate stays open while any
+    recognized face is still being checked, since blinks are read from
+    consecutive frames of a face that otherwise holds still.
+    Colour conversions and resizes write into buffers kept between frames,
+    and keyframes reuse the optical-flow resize for detection when both
+    run at the same scale.
+    """
+
+    def __init__(self, gallery, detect_every=None, identity_ttl=None, use_optical_flow=None, batcher=None,
+                 motion_gate=None, liveness=None):
+        self.gallery = gallery
+        self.batcher = batcher
+        if motion_gate is None and config.MOTION_GATE:
+            motion_gate = MotionGate()
+        self.motion_gate = motion_gate or None
+        if liveness is None and config.LIVENESS_ENABLED:
+            liveness = LivenessChecker()
+        self.liveness = liveness or None
+        self.detect_every = detect_every or config.DETECT_EVERY_N_FRAMES
+        self.identity_ttl = identity_ttl if identity_ttl is not None else config.IDENTITY_TTL_SECONDS
+        self.use_optical_flow = config.TRACKER_OPTICAL_FLOW if use_optical_flow is None else use_optical_flow
+        self.tracker = FaceTracker(config.TRACK_IOU_THRESHOLD, config.TRACK_MAX_MISSES)
+        self.frame_index = 0
+        self.prev_gray = None
+        self.force_detection = True
+        self.liveness_pending = False
+        self.results = []
+        # Reused conversion buffers; two grayscale buffers so the previous one stays valid for optical flow
+        self._rgb = None
+        self._small = None
+        self._small_rgb = None
+        self._grays = [None, None]
+
+    def _flow_gray(self, frame):
+        height, width = frame.shape[:2]
+        size = (int(width * config.TRACKER_FLOW_SCALE), int(height * config.TRACKER_FLOW_SCALE))
+        self._small = cv2.resize(frame, size, dst=self._small, interpolation=cv2.INTER_AREA)
+        self._grays.reverse()
+        self._grays[0] = cv2.cvtColor(self._small, cv2.COLOR_BGR2GRAY, dst=self._grays[0])
+        return self._grays[0]
+
+    def process(self, frame):
+        """
+        Returns a list of (location, student_id, name) for the given BGR frame,
+        in the same shape as find_faces.
+        """
+        now = time.monotonic()
+        if self.motion_gate is not None and not self.force_detection:
+            with METRICS.timer("motion_gate"):
+                changed = self.motion_gate.changed(frame, now)
+            # The gate still sees every frame so its reference stays current
+            if not changed and not self.liveness_pending:
+                METRICS.count("frames_gated")
+                return self.results
+            # A forced pass follows a run of skipped frames, so the tracks are re-detected, not propagated
+            if changed and self.motion_gate.forced:
+                self.force_detection = True
+
+        gray = self._flow_gray(frame) if self.use_optical_flow else None
+        keyframe = (
+            self.force_detection
+            or not self.tracker.tracks
+            or self.frame_index % self.detect_every == 0
+        )
+        self.frame_index += 1
+
+        if keyframe:
+            self._rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB, dst=self._rgb)
+            rgb_frame = self._rgb
+            small_rgb = None
+            if self.use_optical_flow and config.DETECTION_SCALE == config.TRACKER_FLOW_SCALE:
+                self._small_rgb = cv2.cvtColor(self._small, cv2.COLOR_BGR2RGB, dst=self._small_rgb)
+                small_rgb = self._small_rgb
+            with METRICS.timer("detection"):
+                face_locations = detect_faces(rgb_frame, small_frame=small_rgb)
+            tracks = self.tracker.update(face_locations)
+            METRICS.count("faces_detected", len(face_locations))
+
+            # Only new tracks and expired identities go through the encoder
+            stale = [t for t in tracks if t.needs_encoding(now, self.identity_ttl, config.UNKNOWN_RETRY_SECONDS)]
+            if stale:
+                locations = [t.location for t in stale]
+                if self.batcher is not None:
+                    with METRICS.timer("encoding_batched"):
+                        matches = self.batcher.submit(rgb_frame, locations)
+                else:
+                    with METRICS.timer("encoding"):
+                        face_encodings = face_recognition.face_encodings(rgb_frame, locations)
+                    with METRICS.timer("matching"):
+                        matches = self.gallery.match(face_encodings)
+                METRICS.count("faces_matched", sum(student_id is not None for student_id, _ in matches))
+                for track, (student_id, distance) in zip(stale, matches):
+                    name = f"Student {student_id}" if student_id is not None else None
+                    track.set_identity(student_id, name, distance, now)
+            self.force_detection = False
+        elif self.use_optical_flow and self.prev_gray is not None:
+            with METRICS.timer("tracking"):
+                self.force_detection = not self.tracker.propagate(self.prev_gray, gray, config.TRACKER_FLOW_SCALE)
+
+        self.prev_gray = gray
+        visible = [track for track in self.tracker.tracks if not track.misses]
+        if self.liveness is not None:
+            # Reuse the optical-flow grayscale frame when there is one
+            image, scale = (gray, config.TRACKER_FLOW_SCALE) if gray is not None else (frame, 1.0)
+            with METRICS.timer("liveness"):
+                live = {track.id for track in visible
+                        if track.student_id is not None and self.liveness.update(track, image, scale)}
+            self.liveness_pending = any(track.student_id is not None and track.id not in live for track in visible)
+        else:
+            live = {track.id for track in visible}
+        # Faces still being checked are shown without an identity, so no attendance is recorded for them
+        self.results = [
+            (track.location, track.student_id, track.name) if track.id in live else (track.location, None, None)
+            for track in visible
+        ]
+        return self.results
 
 def register_face(frame):
     """
@@ -69,7 +217,7 @@ def register_face(frame):
     Returns the face image and a message.
     """
     rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-    face_locations = face_recognition.face_locations(rgb_frame)
+    face_locations = detect_faces(rgb_frame)
     
     if len(face_locations) != 1:
         return None, "Please ensure exactly one face is visible."
@@ -79,27 +227,41 @@ def register_face(frame):
     
     return face_image, "Face captured successfully."
 
-def register_new_face(image_path, db):
+def encode_single_faces(frames):
+    """
+    Encodings of the one face in each BGR frame, for enrollment bursts.
+    Frames with no face or several faces are skipped.
+    """
+    face_encodings = []
+    for frame in frames:
+        rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+        face_locations = detect_faces(rgb_frame)
+        if len(face_locations) == 1:
+            face_encodings.extend(face_recognition.face_encodings(rgb_frame, face_locations))
+    return face_encodings
+
+def register_new_face(image_path, db, gallery=None, burst_encodings=None):
     """
     Encode and save the new face to the database.
+    The saved image gives the first sample and burst_encodings, the
+    encodings of an enrollment burst, the rest. When a gallery is given the
+    new samples are appended to it in place.
     """
     image = face_recognition.load_image_file(image_path)
-    face_encodings = face_recognition.face_encodings(image)
+    face_encodings = face_recognition.face_encodings(image)[:1]
     
     if not face_encodings:
         return False, "No face encoding found in the image."
+    if burst_encodings is not None:
+        face_encodings += list(burst_encodings)
+        if len(face_encodings) < config.ENROLL_MIN_SAMPLES:
+            return False, "Too few usable frames; please hold still and face the camera."
     
-    face_encoding = face_encodings[0]
-    face_encoding_blob = face_encoding.tobytes()
+    # Insert the student and all of their samples into the database
+    student_id = db.insert_student("Unknown", face_encodings)
+    if not student_id:
+        return False, "Database error during registration."
     
-    # Insert into the database
-    try:
-        db.cursor.execute("""
-            INSERT INTO students (name, face_encoding)
-            VALUES (%s, %s)
-        """, ("Unknown", face_encoding_blob))
-        db.connection.commit()
-        return True, "Face registered successfully."
-    except mysql.connector.Error as err:
-        print(f"Error registering face: {err}")
-        return False, "Database error during registration."
\ No newline at end of file
+    if gallery is not None:
+        gallery.refresh(db)
+    return True, f"Face registered successfully with {len(face_encodings)} samples."
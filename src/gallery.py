@@ -0,0 +1,476 @@
+import json
+import os
+import threading
+import numpy as np
+import config
+from ann import IVFIndex
+from storage import StorageError
+
+ENCODING_SIZE = 128
+
+SNAPSHOT_VERSION = 2
+SNAPSHOT_ENCODINGS = "gallery_encodings.npy"
+SNAPSHOT_IDS = "gallery_ids.npy"
+SNAPSHOT_SAMPLE_IDS = "gallery_sample_ids.npy"
+SNAPSHOT_META = "gallery_meta.json"
+
+# Above this many records, extend() appends in bulk and rebuilds the templates
+BULK_EXTEND_ROWS = 256
+
+
+def _grown(array, size):
+    """Copy of array with twice the rows, the first size of them kept."""
+    grown = np.empty((array.shape[0] * 2,) + array.shape[1:], dtype=array.dtype)
+    grown[:size] = array[:size]
+    return grown
+
+
+class GalleryIndex:
+    """
+    Resident index of every stored face encoding sample, grouped by student.
+    Samples live in contiguous float32 matrices: an optional read-only base
+    (memory-mapped from a snapshot and shared between processes) plus a
+    private tail for samples added since. Each student also has a template,
+    the mean of their samples, kept in a separate matrix. A match compares
+    the queries with the templates first and then re-ranks the closest few
+    students on all of their samples.
+    Removed samples stay in the matrices with an infinite norm, so they can
+    never be the closest row, until the next snapshot drops them.
+    """
+
+    def __init__(self, dim=ENCODING_SIZE, capacity=1024, backend=None):
+        self.dim = dim
+        # Sample rows; ids hold the student of each row
+        self._base = np.empty((0, dim), dtype=np.float32)
+        self._base_ids = np.empty(0, dtype=np.int64)
+        self._base_sample_ids = np.empty(0, dtype=np.int64)
+        self._base_sq_norms = np.empty(0, dtype=np.float32)
+        self._matrix = np.empty((capacity, dim), dtype=np.float32)
+        self._ids = np.empty(capacity, dtype=np.int64)
+        self._sample_ids = np.empty(capacity, dtype=np.int64)
+        self._sq_norms = np.empty(capacity, dtype=np.float32)
+        self._size = 0
+        self._removed = 0
+        # Per-student templates
+        self._rows_by_student = {}
+        self._template_of = {}
+        self._templates = np.empty((capacity, dim), dtype=np.float32)
+        self._template_ids = np.empty(capacity, dtype=np.int64)
+        self._template_counts = np.zeros(capacity, dtype=np.int64)
+        self._template_sq_norms = np.empty(capacity, dtype=np.float32)
+        self._template_count = 0
+        self._names = {}
+        # Highest sample id loaded, the watermark for refresh()
+        self.max_id = 0
+        # Recognition workers match while the GUI thread may be adding rows
+        self._lock = threading.RLock()
+
+        self.backend = backend or config.GALLERY_BACKEND
+        if self.backend not in ("exact", "ivf"):
+            raise ValueError(f"Unknown gallery backend: {self.backend}")
+        self.ann = self._new_ann()
+
+    def _new_ann(self):
+        if self.backend == "ivf":
+            return IVFIndex(config.IVF_NLIST, config.IVF_NPROBE, config.IVF_TRAIN_ITERATIONS)
+        return None
+
+    @classmethod
+    def from_db(cls, db, backend=None):
+        """Build the index once from every stored sample."""
+        records = db.fetch_face_encodings()
+        index = cls(capacity=max(len(records), 1024), backend=backend)
+        index.extend(records)
+        return index
+
+    @classmethod
+    def from_snapshot(cls, directory, backend=None):
+        """
+        Map a snapshot written by save_snapshot read-only.
+        Returns None when there is no usable snapshot in the directory.
+        """
+        try:
+            with open(os.path.join(directory, SNAPSHOT_META)) as f:
+                meta = json.load(f)
+            if meta.get("version") != SNAPSHOT_VERSION:
+                return None
+            base = np.load(os.path.join(directory, SNAPSHOT_ENCODINGS), mmap_mode="r")
+            base_ids = np.load(os.path.join(directory, SNAPSHOT_IDS), mmap_mode="r")
+            base_sample_ids = np.load(os.path.join(directory, SNAPSHOT_SAMPLE_IDS), mmap_mode="r")
+        except (OSError, ValueError):
+            return None
+        if not len(base) == len(base_ids) == len(base_sample_ids) == meta["row_count"]:
+            return None
+
+        index = cls(dim=base.shape[1], backend=backend)
+        index._base = base
+        index._base_ids = base_ids
+        index._base_sample_ids = base_sample_ids
+        index._base_sq_norms = np.einsum("ij,ij->i", base, base)
+        index._names = {int(k): v for k, v in meta["names"].items()}
+        index.max_id = meta["max_id"]
+        index._rebuild_templates()
+        return index
+
+    @classmethod
+    def load(cls, db, snapshot_dir=None, backend=None):
+        """
+        Startup path: map the snapshot, drop samples deleted since it was
+        written and fetch only the samples newer than its watermark, falling
+        back to a full load. The snapshot is rewritten when it is missing or
+        too far behind the database. A snapshot that cannot be checked
+        against the database is not used.
+        """
+        snapshot_dir = snapshot_dir or config.SNAPSHOT_DIR
+        index = cls.from_snapshot(snapshot_dir, backend) if snapshot_dir else None
+        if index is None:
+            index = cls.from_db(db, backend)
+        else:
+            try:
+                index.retain(db.fetch_face_encoding_ids())
+            except StorageError as err:
+                # The snapshot is left in place; a load during an outage must not overwrite it
+                print(f"Ignoring the gallery snapshot: {err}")
+                return cls.from_db(db, backend)
+            index.refresh(db)
+
+        stale = index._size + index._removed
+        if snapshot_dir and (len(index._base) == 0 or stale >= config.SNAPSHOT_REFRESH_ROWS):
+            index.save_snapshot(snapshot_dir)
+            index = cls.from_snapshot(snapshot_dir, backend) or index
+        return index
+
+    def save_snapshot(self, directory):
+        """
+        Write the live samples as a .npy matrix plus student/sample id
+        sidecars. Files are replaced atomically and the meta file, which
+        carries the row-count/max-id watermark, is written last.
+        """
+        os.makedirs(directory, exist_ok=True)
+        with self._lock:
+            live = np.isfinite(self.sq_norms)
+            arrays = {
+                SNAPSHOT_ENCODINGS: self.encodings[live],
+                SNAPSHOT_IDS: self.ids[live],
+                SNAPSHOT_SAMPLE_IDS: self.sample_ids[live],
+            }
+            meta = {
+                "version": SNAPSHOT_VERSION,
+                "row_count": int(np.count_nonzero(live)),
+                "max_id": self.max_id,
+                "names": {str(k): v for k, v in self._names.items()},
+            }
+        for filename, array in arrays.items():
+            path = os.path.join(directory, filename)
+            with open(path + ".tmp", "wb") as f:
+                np.save(f, np.ascontiguousarray(array))
+            os.replace(path + ".tmp", path)
+
+        path = os.path.join(directory, SNAPSHOT_META)
+        with open(path + ".tmp", "w") as f:
+            json.dump(meta, f)
+        os.replace(path + ".tmp", path)
+
+    def __len__(self):
+        """Number of students with at least one sample."""
+        return len(self._rows_by_student)
+
+    @property
+    def sample_count(self):
+        return len(self._base) + self._size - self._removed
+
+    def _concat(self, base, tail):
+        tail = tail[:self._size]
+        if len(self._base) == 0:
+            return tail
+        return np.concatenate([base, tail])
+
+    @property
+    def encodings(self):
+        return self._concat(self._base, self._matrix)
+
+    @property
+    def ids(self):
+        return self._concat(self._base_ids, self._ids)
+
+    @property
+    def sample_ids(self):
+        return self._concat(self._base_sample_ids, self._sample_ids)
+
+    @property
+    def sq_norms(self):
+        return self._concat(self._base_sq_norms, self._sq_norms)
+
+    def name(self, student_id):
+        return self._names.get(student_id)
+
+    def samples(self, student_id):
+        """Sample ids currently held for a student."""
+        rows = self._rows_by_student.get(student_id)
+        if rows is None:
+            return []
+        return [self._sample_id_at(row) for row in rows]
+
+    def _grow(self):
+        self._matrix = _grown(self._matrix, self._size)
+        self._ids = _grown(self._ids, self._size)
+        self._sample_ids = _grown(self._sample_ids, self._size)
+        self._sq_norms = _grown(self._sq_norms, self._size)
+
+    def _grow_templates(self):
+        count = self._template_count
+        self._templates = _grown(self._templates, count)
+        self._template_ids = _grown(self._template_ids, count)
+        self._template_sq_norms = _grown(self._template_sq_norms, count)
+        counts = np.zeros(len(self._templates), dtype=self._template_counts.dtype)
+        counts[:count] = self._template_counts[:count]
+        self._template_counts = counts
+
+    def _update_template(self, student_id, face_encoding, weight):
+        """Fold one sample into (weight 1) or out of (weight -1) a student's template."""
+        t = self._template_of.get(student_id)
+        if t is None:
+            if self._template_count == len(self._templates):
+                self._grow_templates()
+            t = self._template_of[student_id] = self._template_count
+            self._template_count += 1
+            self._template_ids[t] = student_id
+            self._templates[t] = 0.0
+        count = self._template_counts[t] + weight
+        self._template_counts[t] = count
+        template = self._templates[t]
+        if count > 0:
+            # Running mean: move the template towards (or away from) the sample
+            template += weight * (face_encoding - template) / count
+            self._template_sq_norms[t] = np.dot(template, template)
+            if weight > 0 and count == 1 and self.ann is not None and self.ann.is_trained:
+                self.ann.add(t, template)
+        else:
+            self._template_sq_norms[t] = np.inf
+
+    def _rebuild_templates(self):
+        """Recompute every template and the per-student row lists from the live samples."""
+        live_rows = np.flatnonzero(np.isfinite(self.sq_norms))
+        student_ids = self.ids[live_rows]
+        order = np.argsort(student_ids, kind="stable")
+        rows = live_rows[order]
+        unique_ids, starts = np.unique(student_ids[order], return_index=True)
+        capacity = max(len(unique_ids), 1024)
+
+        self._templates = np.empty((capacity, self.dim), dtype=np.float32)
+        self._template_ids = np.empty(capacity, dtype=np.int64)
+        self._template_counts = np.zeros(capacity, dtype=np.int64)
+        self._template_sq_norms = np.empty(capacity, dtype=np.float32)
+        count = self._template_count = len(unique_ids)
+        if count:
+            sums = np.add.reduceat(self._gather(rows)[0], starts, axis=0, dtype=np.float64)
+            counts = np.diff(np.append(starts, len(rows)))
+            self._templates[:count] = sums / counts[:, None]
+            self._template_ids[:count] = unique_ids
+            self._template_counts[:count] = counts
+            self._template_sq_norms[:count] = np.einsum("ij,ij->i", self._templates[:count], self._templates[:count])
+        student_list = unique_ids.tolist()
+        self._template_of = dict(zip(student_list, range(count)))
+        self._rows_by_student = dict(zip(student_list, np.split(rows, starts[1:]) if count else []))
+        self.ann = self._new_ann()
+
+    def _append(self, student_id, face_encoding, sample_id):
+        if self._size == self._matrix.shape[0]:
+            self._grow()
+        self._matrix[self._size] = face_encoding
+        self._ids[self._size] = student_id
+        self._sample_ids[self._size] = sample_id
+        row = self._matrix[self._size]
+        self._sq_norms[self._size] = np.dot(row, row)
+        self._size += 1
+        if sample_id > self.max_id:
+            self.max_id = sample_id
+        return row
+
+    def add(self, student_id, face_encoding, name=None, sample_id=None):
+        """Append one sample and update its student's template without reloading."""
+        with self._lock:
+            row = self._append(student_id, face_encoding, -1 if sample_id is None else sample_id)
+            global_row = len(self._base) + self._size - 1
+            rows = self._rows_by_student.get(student_id)
+            self._rows_by_student[student_id] = (
+                np.array([global_row]) if rows is None else np.append(rows, global_row)
+            )
+            self._update_template(student_id, row, 1)
+            if name is not None:
+                self._names[student_id] = name
+
+    def extend(self, records):
+        """Append (sample_id, student_id, name, face_encoding) rows."""
+        records = list(records)
+        if len(records) <= BULK_EXTEND_ROWS:
+            for sample_id, student_id, name, face_encoding in records:
+                self.add(student_id, face_encoding, name, sample_id)
+            return
+        with self._lock:
+            for sample_id, student_id, name, face_encoding in records:
+                self._append(student_id, face_encoding, sample_id)
+                self._names[student_id] = name
+            self._rebuild_templates()
+
+    def refresh(self, db):
+        """Pick up samples stored since the gallery was loaded; returns how many."""
+        records = db.fetch_face_encodings(since_id=self.max_id)
+        self.extend(records)
+        return len(records)
+
+    def _remove_rows(self, rows):
+        if len(rows) == 0:
+            return
+        in_base = rows < len(self._base)
+        self._base_sq_norms[rows[in_base]] = np.inf
+        self._sq_norms[rows[~in_base] - len(self._base)] = np.inf
+        self._removed += len(rows)
+
+    def remove_sample(self, sample_id):
+        """Drop one sample and update its student's template; returns False if it is not loaded."""
+        with self._lock:
+            rows = np.flatnonzero((self.sample_ids == sample_id) & np.isfinite(self.sq_norms))
+            if len(rows) == 0:
+                return False
+            row = rows[0]
+            student_id = self._id_at(row)
+            face_encoding = self._gather(rows[:1])[0][0]
+            self._remove_rows(rows[:1])
+            remaining = self._rows_by_student[student_id]
+            remaining = remaining[remaining != row]
+            if len(remaining):
+                self._rows_by_student[student_id] = remaining
+            else:
+                del self._rows_by_student[student_id]
+            self._update_template(student_id, face_encoding, -1)
+            return True
+
+    def retain(self, sample_ids):
+        """Drop every loaded sample whose id is not in sample_ids (deleted elsewhere)."""
+        with self._lock:
+            keep = np.fromiter(sample_ids, dtype=np.int64, count=len(sample_ids))
+            stale = ~np.isin(self.sample_ids, keep) & np.isfinite(self.sq_norms)
+            rows = np.flatnonzero(stale)
+            if len(rows):
+                self._remove_rows(rows)
+                self._rebuild_templates()
+            return len(rows)
+
+    def _queries(self, face_encodings):
+        return np.asarray(face_encodings, dtype=self._matrix.dtype).reshape(-1, self.dim)
+
+    def _gather(self, rows):
+        """Encodings and squared norms for global row indices."""
+        in_base = rows < len(self._base)
+        points = np.empty((len(rows), self.dim), dtype=self._matrix.dtype)
+        sq_norms = np.empty(len(rows), dtype=self._sq_norms.dtype)
+        points[in_base] = self._base[rows[in_base]]
+        sq_norms[in_base] = self._base_sq_norms[rows[in_base]]
+        tail_rows = rows[~in_base] - len(self._base)
+        points[~in_base] = self._matrix[tail_rows]
+        sq_norms[~in_base] = self._sq_norms[tail_rows]
+        return points, sq_norms
+
+    @staticmethod
+    def _euclidean(queries, points, sq_norms):
+        sq = (
+            np.einsum("ij,ij->i", queries, queries)[:, None]
+            + sq_norms[None, :]
+            - 2.0 * queries @ points.T
+        )
+        np.maximum(sq, 0.0, out=sq)
+        return np.sqrt(sq)
+
+    def distances(self, face_encodings, rows=None):
+        """
+        Euclidean distances between each query encoding and the sample rows
+        (all rows, or only the given row indices).
+        Returns an array of shape (len(face_encodings), len(rows)).
+        """
+        queries = self._queries(face_encodings)
+        if rows is not None:
+            return self._euclidean(queries, *self._gather(rows))
+
+        tail = self._euclidean(queries, self._matrix[:self._size], self._sq_norms[:self._size])
+        if len(self._base) == 0:
+            return tail
+        base = self._euclidean(queries, self._base, self._base_sq_norms)
+        return np.hstack([base, tail])
+
+    def _use_ann(self):
+        count = self._template_count
+        if self.ann is None or count < config.IVF_MIN_GALLERY_SIZE:
+            return False
+        # Retrain once the number of templates has doubled since the last clustering
+        if not self.ann.is_trained or count >= 2 * self.ann.trained_size:
+            self.ann.train(self._templates[:count])
+        return True
+
+    def shortlist(self, face_encodings, size=None):
+        """
+        Template rows of the students closest to any of the query encodings,
+        at most size per query. The IVF backend only probes its buckets.
+        """
+        queries = self._queries(face_encodings)
+        size = size or config.GALLERY_SHORTLIST
+        count = self._template_count
+        if not self._use_ann():
+            distances = self._euclidean(queries, self._templates[:count], self._template_sq_norms[:count])
+            if size >= count:
+                return np.arange(count)
+            return np.unique(np.argpartition(distances, size - 1, axis=1)[:, :size])
+
+        shortlisted = []
+        for query, rows in zip(queries, self.ann.candidates(queries)):
+            if len(rows) == 0:
+                rows = np.arange(count)
+            distances = self._euclidean(query[None], self._templates[rows], self._template_sq_norms[rows])[0]
+            if len(rows) > size:
+                rows = rows[np.argpartition(distances, size - 1)[:size]]
+            shortlisted.append(rows)
+        return np.unique(np.concatenate(shortlisted))
+
+    def _id_at(self, row):
+        if row < len(self._base):
+            return int(self._base_ids[row])
+        return int(self._ids[row - len(self._base)])
+
+    def _sample_id_at(self, row):
+        if row < len(self._base):
+            return int(self._base_sample_ids[row])
+        return int(self._sample_ids[row - len(self._base)])
+
+    def match(self, face_encodings, tolerance=None):
+        """
+        Find the closest known student for each query encoding.
+        Templates shortlist a few students per query; the distance reported
+        is to the closest sample of those students. Returns a list of
+        (student_id, distance); student_id is None when the best distance is
+        above the tolerance.
+        """
+        if tolerance is None:
+            tolerance = config.MATCH_TOLERANCE
+        if len(face_encodings) == 0:
+            return []
+
+        with self._lock:
+            if len(self) == 0:
+                return [(None, None) for _ in face_encodings]
+            queries = self._queries(face_encodings)
+            students = self._template_ids[self.shortlist(queries)]
+            rows = np.concatenate([
+                self._rows_by_student[student_id]
+                for student_id in students.tolist() if student_id in self._rows_by_student
+            ])
+            # Exact re-ranking on every sample of the shortlisted students
+            distances = self.distances(queries, rows)
+            best = np.argmin(distances, axis=1)
+
+            results = []
+            for row, distance in zip(rows[best], distances[np.arange(len(best)), best]):
+                if distance <= tolerance:
+                    results.append((self._id_at(row), float(distance)))
+                else:
+                    results.append((None, float(distance)))
+        return results
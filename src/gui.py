@@ -2,28 +2,133 @@ from PyQt6.QtWidgets import (
     QMainWindow, QTabWidget, QWidget, QVBoxLayout, QLabel, QPushButton,
     QFileDialog, QMessageBox, QToolBar
 )
-from PyQt6.QtGui import QImage, QPixmap, QFont
-from PyQt6.QtCore import QTimer
+from PyQt6.QtGui import QPixmap, QFont
+from PyQt6.QtCore import QTimer, QThread, pyqtSignal
 import cv2
-from face_recognition_module import load_known_faces, recognize_faces, register_face, register_new_face
-from database import Database
+import queue
+import time
+from face_recognition_module import load_known_faces, FaceRecognizer, register_face, register_new_face
+from display import FrameRenderer
+from storage import create_database
 from admin_portal import AdminPortal
+from pipeline import FrameGrabber
+from burst import GrabberBurst
+from attendance import AttendanceWriter
+from schedule import ClassSchedule
+from metrics import METRICS
+import config
 from datetime import datetime
 
+class RecognitionWorker(QThread):
+    """
+    Runs recognition on the newest captured frame, as fast as the CPU allows.
+    Frames captured while a recognition pass is running are skipped.
+    """
+    results_ready = pyqtSignal(object)
+
+    def __init__(self, grabber, gallery):
+        super().__init__()
+        self.grabber = grabber
+        self.recognizer = FaceRecognizer(gallery)
+        self._running = True
+
+    def run(self):
+        seq = 0
+        while self._running and self.grabber.running:
+            last_seq = seq
+            seq, frame = self.grabber.latest(after_seq=seq, timeout=0.5)
+            if frame is None:
+                continue
+            METRICS.count("frames_dropped", seq - last_seq - 1)
+            with METRICS.timer("recognition"):
+                results = self.recognizer.process(frame)
+            METRICS.count("frames_processed")
+            self.results_ready.emit(results)
+
+    def stop(self):
+        self._running = False
+        self.wait()
+
+
+class AttendanceWorker(QThread):
+    """
+    Records attendance and refreshes the class schedule off the GUI thread.
+    The GUI only enqueues recognized students; marks are warmed, buffered and
+    flushed here, and the schedule is reloaded every SCHEDULE_REFRESH_SECONDS.
+    """
+
+    def __init__(self, attendance, schedule, room=None):
+        super().__init__()
+        self.attendance = attendance
+        self.schedule = schedule
+        self.room = room
+        self.queue = queue.Queue()
+
+    def enqueue(self, student_ids, now):
+        self.queue.put((student_ids, now))
+
+    def run(self):
+        next_refresh = time.monotonic() + config.SCHEDULE_REFRESH_SECONDS
+        while True:
+            try:
+                item = self.queue.get(timeout=config.ATTENDANCE_FLUSH_SECONDS)
+            except queue.Empty:
+                item = ()
+            if item is None:
+                break
+            if item:
+                student_ids, now = item
+                class_id = self.schedule.active_class_id(now, self.room)
+                if class_id is not None:
+                    # Duplicates are dropped in memory and new marks written in batches
+                    for student_id in student_ids:
+                        self.attendance.mark(student_id, class_id, now)
+            self.attendance.flush_if_due()
+            if time.monotonic() >= next_refresh:
+                self.schedule.refresh()
+                next_refresh = time.monotonic() + config.SCHEDULE_REFRESH_SECONDS
+        self.attendance.flush()
+
+    def stop(self):
+        """Stop after the queued marks are recorded, flushing them."""
+        self.queue.put(None)
+        self.wait()
+
+
 class FaceRecognitionApp(QMainWindow):
-    def __init__(self):
+    def __init__(self, db=None):
         super().__init__()
         self.setWindowTitle("Face Recognition System")
         self.setGeometry(100, 100, 1024, 768)
 
-        self.db = Database()
+        self.db = db or create_database()
 
         # Initialize variables
-        self.known_face_encodings, self.known_face_ids = load_known_faces(self.db)
+        self.gallery = load_known_faces(self.db)
         self.camera = None
+        self.worker = None
+        self.burst = None
+        self.burst_face = None
+        self.display_seq = 0
+        self.last_results = []
         self.timer = QTimer()
         self.timer.timeout.connect(self.update_camera)
 
+        # Active-class lookups go to an in-memory schedule index, refreshed periodically
+        self.schedule = ClassSchedule(self.db)
+        self.schedule.refresh()
+
+        # Attendance marks are buffered and flushed on a short interval, all on a worker thread
+        self.attendance = AttendanceWriter(self.db)
+        self.attendance_worker = AttendanceWorker(self.attendance, self.schedule, config.CAMERA_ROOM)
+        self.attendance_worker.start()
+
+        # Optional plain-text metrics file for scraping
+        if METRICS.enabled and config.METRICS_FILE:
+            self.metrics_timer = QTimer()
+            self.metrics_timer.timeout.connect(lambda: METRICS.write_file(config.METRICS_FILE))
+            self.metrics_timer.start(int(config.METRICS_FILE_SECONDS * 1000))
+
         # Set up tabs
         self.tabs = QTabWidget(self)
         self.setCentralWidget(self.tabs)
@@ -96,6 +201,7 @@ class FaceRecognitionApp(QMainWindow):
         self.video_label = QLabel()
         self.video_label.setFixedSize(800, 600)
         layout.addWidget(self.video_label)
+        self.renderer = FrameRenderer(800, 600)
 
         # Buttons
         self.start_button = QPushButton("Start Camera")
@@ -111,7 +217,8 @@ class FaceRecognitionApp(QMainWindow):
 
         # Instructions
         instruction_label = QLabel(
-            "To register a new face, click 'Capture Face' while the camera is active.",
+            "To register a new face, click 'Capture Face' while the camera is active "
+            "and keep looking at the camera for a moment.",
             objectName="instruction_label"
         )
         layout.addWidget(instruction_label)
@@ -122,99 +229,123 @@ class FaceRecognitionApp(QMainWindow):
         layout.addWidget(self.capture_button)
 
         # Faces loaded status
-        self.face_load_status = QLabel(f"Registered {len(self.known_face_ids)} faces.", objectName="face_load_status")
+        self.face_load_status = QLabel(f"Registered {len(self.gallery)} students.", objectName="face_load_status")
         layout.addWidget(self.face_load_status)
 
     def start_camera(self):
-        self.camera = cv2.VideoCapture(0)
-        if not self.camera.isOpened():
+        if self.camera is not None:
+            return
+        self.camera = FrameGrabber(0)
+        if not self.camera.is_opened():
+            self.camera.stop()
+            self.camera = None
             QMessageBox.critical(self, "Error", "Could not access the camera")
             self.status_label.setText("Error: Camera initialization failed")
             return
+        self.camera.start()
+
+        # Recognition runs on its own thread and reports back through a signal
+        self.worker = RecognitionWorker(self.camera, self.gallery)
+        self.worker.results_ready.connect(self.on_results)
+        self.worker.start()
+
+        self.display_seq = 0
+        self.last_results = []
         self.status_label.setText("Camera Active - Detecting Faces")
-        self.timer.start(30)
+        self.timer.start(15)
 
     def stop_camera(self):
         if self.camera is not None:
             self.timer.stop()
-            self.camera.release()
+            self.worker.stop()
+            self.worker = None
+            self.camera.stop()
             self.camera = None
             self.video_label.clear()
         self.status_label.setText("System Ready - No Camera Active")
 
+    def on_results(self, results):
+        self.last_results = results
+        
+        # Record attendance for recognized students
+        student_ids = [student_id for location, student_id, name in results if student_id is not None]
+        if student_ids:
+            self.record_attendance(student_ids)
+
     def update_camera(self):
         if self.camera is not None:
-            ret, frame = self.camera.read()
-            if not ret:
+            if not self.camera.running:
                 self.stop_camera()
                 return
 
-            frame, recognized_students = recognize_faces(frame, self.db)
-            
-            # Record attendance for recognized students
-            for student_id, name in recognized_students:
-                self.record_attendance(student_id)
-                
-            # Update display
-            rgb_image = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-            h, w, ch = rgb_image.shape
-            qt_image = QImage(rgb_image.data, w, h, ch * w, QImage.Format.Format_RGB888)
-            self.video_label.setPixmap(QPixmap.fromImage(qt_image))
+            # Only repaint when the capture thread has a newer frame
+            seq, frame = self.camera.latest(after_seq=self.display_seq)
+            if frame is None:
+                return
+            self.display_seq = seq
+
+            with METRICS.timer("display"):
+                # Results are drawn on the renderer's display-size buffer, never on the shared frame
+                overlay = METRICS.draw_overlay if METRICS.enabled and config.METRICS_OVERLAY else None
+                image = self.renderer.render(frame, self.last_results, overlay)
+                self.video_label.setPixmap(QPixmap.fromImage(image))
 
     def capture_face(self):
         if self.camera is None:
             QMessageBox.warning(self, "Warning", "Please start the camera first!")
             return
 
-        ret, frame = self.camera.read()
-        if ret:
+        seq, frame = self.camera.latest()
+        if frame is not None:
             # Use register_face function from face_recognition_module
             face_image, message = register_face(frame)
             if face_image is None:
                 QMessageBox.warning(self, "Error", message)
                 return
 
-            name, ok = QFileDialog.getSaveFileName(
-                self,
-                "Save New Face",
-                "known_faces/",
-                "Images (*.jpg *.jpeg *.png)"
-            )
-            if ok:
-                cv2.imwrite(name, face_image)
-                # Load and encode the new face using face_recognition_module
-                success, msg = register_new_face(name, self.db)
-                if success:
-                    self.known_face_encodings, self.known_face_ids = load_known_faces(self.db)
-                    self.face_load_status.setText(f"Registered {len(self.known_face_ids)} faces.")
-                    QMessageBox.information(self, "Success", "New face registered successfully!")
-                else:
-                    QMessageBox.warning(self, "Error", msg)
-
-    def record_attendance(self, student_id):
-        # Get current active class
-        now = datetime.now()
-        self.db.cursor.execute("""
-            SELECT id FROM classes 
-            WHERE start_time <= %s AND end_time >= %s
-        """, (now, now))
-        active_class = self.db.cursor.fetchone()
-        
-        if active_class:
-            # Check if attendance already recorded
-            self.db.cursor.execute("""
-                SELECT id FROM attendance 
-                WHERE student_id = %s AND class_id = %s 
-                AND DATE(timestamp) = DATE(%s)
-            """, (student_id, active_class[0], now))
-            
-            if not self.db.cursor.fetchone():
-                self.db.cursor.execute("""
-                    INSERT INTO attendance (student_id, class_id, timestamp)
-                    VALUES (%s, %s, %s)
-                """, (student_id, active_class[0], now))
-                self.db.connection.commit()
+            # The rest of the burst is captured and encoded on a worker thread
+            self.burst_face = face_image
+            self.capture_button.setEnabled(False)
+            self.status_label.setText("Capturing face samples - keep looking at the camera")
+            self.burst = GrabberBurst(self.camera, seq, config.ENROLL_BURST_FRAMES - 1)
+            self.burst.captured.connect(self.on_burst_captured)
+            self.burst.start()
+
+    def on_burst_captured(self, burst_encodings):
+        face_image, self.burst_face = self.burst_face, None
+        self.burst.wait()
+        self.burst = None
+        self.capture_button.setEnabled(True)
+        self.status_label.setText("Camera Active - Detecting Faces" if self.camera is not None
+                                  else "System Ready - No Camera Active")
+
+        name, ok = QFileDialog.getSaveFileName(
+            self,
+            "Save New Face",
+            "known_faces/",
+            "Images (*.jpg *.jpeg *.png)"
+        )
+        if ok:
+            cv2.imwrite(name, face_image)
+            # Load and encode the new face using face_recognition_module
+            success, msg = register_new_face(name, self.db, self.gallery, burst_encodings)
+            if success:
+                self.face_load_status.setText(f"Registered {len(self.gallery)} students.")
+                QMessageBox.information(self, "Success", msg)
+            else:
+                QMessageBox.warning(self, "Error", msg)
+
+    def record_attendance(self, student_ids):
+        # The active class is looked up and the marks written on the attendance worker
+        self.attendance_worker.enqueue(student_ids, datetime.now())
 
     def open_admin_portal(self):
-        self.admin = AdminPortal(self.db)  # Pass the existing Database instance
-        self.admin.show()
\ No newline at end of file
+        self.admin = AdminPortal(self.db, self.gallery, self.schedule)  # Share the existing Database, gallery and schedule
+        self.admin.show()
+
+    def closeEvent(self, event):
+        if self.burst is not None:
+            self.burst.wait()
+        self.stop_camera()
+        self.attendance_worker.stop()
+        super().closeEvent(event)
@@ -0,0 +1,87 @@
+from collections import deque
+
+import cv2
+import numpy as np
+
+import config
+
+
+class FaceLiveness:
+    """Liveness cues collected for one tracked face."""
+
+    def __init__(self, window):
+        self.sharpness = deque(maxlen=window)
+        self.contrast = deque(maxlen=window)
+        self.blinks = deque(maxlen=window)
+        self.prev = None
+        self.passed = False
+
+
+class LivenessChecker:
+    """
+    Multi-frame liveness check on face crops.
+    Each frame, a tracked face is cut out, converted to grayscale and
+    shrunk to a small square, so the cost per face does not depend on the
+    frame size. Sharpness (Laplacian variance) and contrast reject blurry,
+    flat replays. Changes concentrated in the eye band, such as blinks,
+    count as live movement, while whole-crop shifts do not. A face that has
+    passed stays passed for the rest of its track and is not checked again.
+    """
+
+    def __init__(self, crop_size=None, window=None, min_frames=None):
+        self.crop_size = crop_size or config.LIVENESS_CROP_SIZE
+        self.window = window or config.LIVENESS_WINDOW
+        self.min_frames = min_frames or config.LIVENESS_MIN_FRAMES
+        size = self.crop_size
+        self._eye_band = slice(int(size * 0.2), int(size * 0.5))
+        self._lower_band = slice(int(size * 0.6), size)
+
+    def _crop(self, frame, location, scale):
+        top, right, bottom, left = (int(v * scale) for v in location)
+        height, width = frame.shape[:2]
+        top, left = max(top, 0), max(left, 0)
+        bottom, right = min(bottom, height), min(right, width)
+        if bottom - top < 8 or right - left < 8:
+            return None
+        face = frame[top:bottom, left:right]
+        if face.ndim == 3:
+            face = cv2.cvtColor(face, cv2.COLOR_BGR2GRAY)
+        return cv2.resize(face, (self.crop_size, self.crop_size), interpolation=cv2.INTER_AREA)
+
+    def update(self, track, frame, scale=1.0):
+        """
+        Add this frame's cues for a track; returns True once the face has
+        passed. frame may be BGR or grayscale, resized from the capture by
+        scale (the recognizer passes its optical-flow grayscale frame).
+        """
+        state = track.liveness
+        if state is None:
+            state = track.liveness = FaceLiveness(self.window)
+        if state.passed:
+            return True
+
+        crop = self._crop(frame, track.location, scale)
+        if crop is None:
+            return False
+        laplacian = cv2.Laplacian(crop, cv2.CV_32F)
+        state.sharpness.append(float(laplacian.var()))
+        state.contrast.append(float(crop.std(dtype=np.float32)))
+        if state.prev is not None:
+            diff = cv2.absdiff(crop, state.prev)
+            eye_change = float(diff[self._eye_band].mean())
+            lower_change = float(diff[self._lower_band].mean())
+            state.blinks.append(
+                eye_change >= config.LIVENESS_MIN_CHANGE
+                and eye_change >= config.LIVENESS_BLINK_RATIO * lower_change
+            )
+        state.prev = crop
+
+        state.passed = bool(
+            len(state.sharpness) >= self.min_frames
+            and np.median(state.sharpness) >= config.LIVENESS_MIN_SHARPNESS
+            and np.median(state.contrast) >= config.LIVENESS_MIN_CONTRAST
+            and sum(state.blinks) >= config.LIVENESS_MIN_BLINKS
+        )
+        if state.passed:
+            state.prev = None  # Nothing else is needed from this track
+        return state.passed
@@ -1,13 +1,22 @@
 from PyQt6.QtWidgets import QApplication
 import sys
 from gui import FaceRecognitionApp
-from database import Database
+from storage import create_database, StorageError
+from metrics import METRICS
+import config
 
 if __name__ == "__main__":
-    # Initialize the database to create tables
-    db = Database()
+    # Initialize the database (creates tables) once and share it
+    try:
+        db = create_database()
+    except StorageError as err:
+        print(err)
+        sys.exit(1)
+    
+    if METRICS.enabled and config.METRICS_HTTP_PORT:
+        METRICS.serve(config.METRICS_HTTP_PORT)
     
     app = QApplication(sys.argv)
-    window = FaceRecognitionApp()
+    window = FaceRecognitionApp(db)
     window.show()
     sys.exit(app.exec())
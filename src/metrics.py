@@ -0,0 +1,164 @@
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager, nullcontext
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import cv2
+import numpy as np
+
+import config
+
+_NULL_TIMER = nullcontext()
+
+
+class Metrics:
+    """
+    Process-wide stage latencies and counters.
+    Latencies are kept in rolling windows and reported as p50/p95/p99;
+    counter rates are measured over the last rate_window seconds.
+    When disabled, timer() hands back a shared no-op context and count()
+    returns immediately, so instrumentation costs next to nothing.
+    """
+
+    def __init__(self, enabled=False, window=1024, rate_window=None):
+        self.enabled = enabled
+        self.window = window
+        self.rate_window = rate_window or config.METRICS_RATE_SECONDS
+        self._latencies = {}
+        self._counters = {}
+        self._events = {}  # counter -> deque of (time, n) within the rate window
+        self._lock = threading.Lock()
+
+    def timer(self, stage):
+        if not self.enabled:
+            return _NULL_TIMER
+        return self._timed(stage)
+
+    @contextmanager
+    def _timed(self, stage):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(stage, time.perf_counter() - start)
+
+    def observe(self, stage, seconds):
+        if not self.enabled:
+            return
+        with self._lock:
+            samples = self._latencies.get(stage)
+            if samples is None:
+                samples = self._latencies[stage] = deque(maxlen=self.window)
+            samples.append(seconds * 1000)
+
+    def count(self, name, n=1):
+        if not self.enabled:
+            return
+        now = time.monotonic()
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + n
+            events = self._events.get(name)
+            if events is None:
+                events = self._events[name] = deque()
+            events.append((now, n))
+            self._trim(events, now)
+
+    def _trim(self, events, now):
+        while events and now - events[0][0] > self.rate_window:
+            events.popleft()
+
+    def snapshot(self):
+        """({stage: (p50, p95, p99, samples)}, {counter: value}) with latencies in ms."""
+        with self._lock:
+            latencies = {stage: list(samples) for stage, samples in self._latencies.items()}
+            counters = dict(self._counters)
+        summary = {}
+        for stage, samples in latencies.items():
+            p50, p95, p99 = np.percentile(samples, [50, 95, 99])
+            summary[stage] = (p50, p95, p99, len(samples))
+        return summary, counters
+
+    def rate(self, counter):
+        """
+        Per-second rate of a counter over the last rate_window seconds.
+        Counts after the oldest event in the window are divided by the time
+        since it, so the rate is right soon after a counter starts and
+        decays to zero once it stops.
+        """
+        now = time.monotonic()
+        with self._lock:
+            events = self._events.get(counter)
+            if not events:
+                return 0.0
+            self._trim(events, now)
+            if len(events) < 2:
+                return 0.0
+            first_time, first_n = events[0]
+            total = sum(n for _, n in events) - first_n
+        return total / max(now - first_time, 1e-9)
+
+    def render_text(self):
+        """Plain-text exposition, one metric per line."""
+        latencies, counters = self.snapshot()
+        lines = []
+        for stage, (p50, p95, p99, samples) in sorted(latencies.items()):
+            for quantile, value in (("0.5", p50), ("0.95", p95), ("0.99", p99)):
+                lines.append(f'stage_latency_ms{{stage="{stage}",quantile="{quantile}"}} {value:.3f}')
+            lines.append(f'stage_latency_samples{{stage="{stage}"}} {samples}')
+        for name, value in sorted(counters.items()):
+            lines.append(f"{name}_total {value}")
+        return "\n".join(lines) + "\n"
+
+    def overlay_lines(self):
+        """Short lines for the on-screen overlay."""
+        latencies, counters = self.snapshot()
+        lines = [
+            f"capture {self.rate('frames_captured'):.1f} fps  "
+            f"recognition {self.rate('frames_processed'):.1f} fps  "
+            f"dropped {counters.get('frames_dropped', 0)}  "
+            f"gated {counters.get('frames_gated', 0)}"
+        ]
+        for stage, (p50, p95, p99, samples) in sorted(latencies.items()):
+            lines.append(f"{stage}: p50 {p50:.1f} / p95 {p95:.1f} / p99 {p99:.1f} ms")
+        return lines
+
+    def draw_overlay(self, frame):
+        """Draw overlay_lines() in the top-left corner of a BGR frame in place."""
+        for i, line in enumerate(self.overlay_lines()):
+            y = 20 + 18 * i
+            cv2.putText(frame, line, (10, y), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 0, 0), 3)
+            cv2.putText(frame, line, (10, y), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 255, 255), 1)
+        return frame
+
+    def write_file(self, path):
+        with open(path + ".tmp", "w") as f:
+            f.write(self.render_text())
+        os.replace(path + ".tmp", path)
+
+    def serve(self, port, host="127.0.0.1"):
+        """Serve render_text() at http://host:port/metrics from a daemon thread."""
+        metrics = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path != "/metrics":
+                    self.send_error(404)
+                    return
+                body = metrics.render_text().encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        server = ThreadingHTTPServer((host, port), Handler)
+        threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True).start()
+        return server
+
+
+METRICS = Metrics(enabled=config.METRICS_ENABLED)
@@ -0,0 +1,19 @@
+import argparse
+import sys
+from storage import create_database, StorageError
+from utils import FORMATS
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Rewrite legacy float64 face encodings in the students and face_encodings tables.")
+    parser.add_argument("--format", choices=sorted(FORMATS), default=None,
+                        help="target format (defaults to config.ENCODING_FORMAT)")
+    args = parser.parse_args()
+    
+    try:
+        db = create_database()
+    except StorageError as err:
+        print(err)
+        sys.exit(1)
+    migrated = db.migrate_encodings(args.format)
+    print(f"Migrated {migrated} face encodings.")
+    db.close()
@@ -0,0 +1,200 @@
+"""
+Several cameras sharing one recognition engine.
+
+    python src/multi_camera.py --camera 0:A101 --camera 1:A102 --camera doorway.mp4 --workers 4
+
+Each --camera is a device index or video file, optionally followed by the
+room it covers. All cameras share one gallery, one worker pool and one
+attendance writer. Video files are played back in real time, as if they
+were live cameras; use batch_video.py to process recordings faster.
+"""
+import argparse
+import sys
+import threading
+import time
+from datetime import datetime
+
+import config
+from attendance import AttendanceWriter
+from batching import EncodingBatcher
+from storage import create_database, StorageError
+from face_recognition_module import FaceRecognizer, load_known_faces
+from pipeline import FrameGrabber
+from schedule import ClassSchedule
+from metrics import METRICS
+
+
+class CameraSource:
+    """One capture source with its own tracker state and recognition budget."""
+
+    def __init__(self, source, gallery, room=None, target_fps=None, batcher=None):
+        self.source = source
+        self.room = room
+        self.interval = 1.0 / (target_fps or config.CAMERA_TARGET_FPS)
+        self.grabber = FrameGrabber(source)
+        self.recognizer = FaceRecognizer(gallery, batcher=batcher)
+        self.last_seq = 0
+        self.next_due = 0.0
+        self.busy = False
+        self.frames_processed = 0
+        self.frames_dropped = 0
+        self.last_results = []
+
+
+class MultiCameraEngine:
+    """
+    Fair scheduler over N cameras feeding a shared pool of recognition workers.
+    Each camera is given a target recognition rate; workers always serve the
+    camera that is most overdue and only ever look at its newest frame, so
+    under overload frames are dropped instead of latency building up.
+    """
+
+    def __init__(self, gallery, schedule, attendance, workers=None, on_results=None):
+        self.gallery = gallery
+        self.schedule = schedule
+        self.attendance = attendance
+        self.workers = workers or config.ENGINE_WORKERS
+        self.on_results = on_results
+        # Faces from all cameras are encoded and matched in shared micro-batches
+        self.batcher = EncodingBatcher(gallery) if config.ENCODING_BATCH_SIZE > 1 else None
+        self.cameras = []
+        self._threads = []
+        self._running = False
+        self._condition = threading.Condition()
+
+    def add_camera(self, source, room=None, target_fps=None):
+        camera = CameraSource(source, self.gallery, room, target_fps, self.batcher)
+        if not camera.grabber.is_opened():
+            camera.grabber.stop()
+            raise ValueError(f"Could not open camera source {source!r}")
+        self.cameras.append(camera)
+        return camera
+
+    def start(self):
+        self._running = True
+        for camera in self.cameras:
+            camera.grabber.start()
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._work, name=f"recognition-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def stop(self):
+        with self._condition:
+            self._running = False
+            self._condition.notify_all()
+        for thread in self._threads:
+            thread.join()
+        for camera in self.cameras:
+            camera.grabber.stop()
+        if self.batcher is not None:
+            self.batcher.stop()
+        self.attendance.flush()
+
+    def _next_job(self):
+        """Pick the most overdue idle camera with a new frame, waiting if none is due."""
+        with self._condition:
+            while self._running:
+                now = time.monotonic()
+                ready = [c for c in self.cameras if not c.busy and c.grabber.running]
+                if not ready:
+                    self._condition.wait(0.05)
+                    continue
+                camera = min(ready, key=lambda c: c.next_due)
+                if camera.next_due > now:
+                    self._condition.wait(camera.next_due - now)
+                    continue
+                seq, frame = camera.grabber.latest(after_seq=camera.last_seq)
+                if frame is None:
+                    # Nothing new from this camera yet; try again shortly
+                    camera.next_due = now + min(camera.interval, 0.01)
+                    continue
+                camera.frames_dropped += seq - camera.last_seq - 1
+                METRICS.count("frames_dropped", seq - camera.last_seq - 1)
+                camera.last_seq = seq
+                camera.busy = True
+                # Debt is capped at one interval so a slow camera cannot starve the rest
+                camera.next_due = max(camera.next_due + camera.interval, now - camera.interval)
+                return camera, frame
+        return None, None
+
+    def _work(self):
+        while True:
+            camera, frame = self._next_job()
+            if camera is None:
+                return
+            try:
+                with METRICS.timer("recognition"):
+                    results = camera.recognizer.process(frame)
+                camera.last_results = results
+                camera.frames_processed += 1
+                METRICS.count("frames_processed")
+                self._record(camera, results)
+                if self.on_results is not None:
+                    self.on_results(camera, frame, results)
+            except Exception as err:
+                # One bad frame or a dropped database must not end this worker
+                METRICS.count("recognition_errors")
+                print(f"Recognition failed for camera {camera.source!r}: {err!r}")
+            finally:
+                with self._condition:
+                    camera.busy = False
+                    self._condition.notify_all()
+
+    def _record(self, camera, results):
+        student_ids = [student_id for location, student_id, name in results if student_id is not None]
+        if not student_ids:
+            return
+        now = datetime.now()
+        class_id = self.schedule.active_class_id(now, camera.room)
+        if class_id is not None:
+            for student_id in student_ids:
+                self.attendance.mark(student_id, class_id, now)
+
+
+def parse_camera(spec):
+    """'0', '0:A101' or 'video.mp4:A101' -> (source, room)."""
+    source, _, room = spec.rpartition(":") if ":" in spec else (spec, "", "")
+    source = int(source) if source.isdigit() else source
+    return source, room or None
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run recognition for several cameras with one shared engine.")
+    parser.add_argument("--camera", action="append", required=True, help="device index or video file, optionally :room")
+    parser.add_argument("--workers", type=int, default=None, help="recognition worker threads")
+    parser.add_argument("--target-fps", type=float, default=None, help="recognition rate per camera")
+    args = parser.parse_args()
+
+    try:
+        db = create_database()
+    except StorageError as err:
+        print(err)
+        sys.exit(1)
+    if METRICS.enabled and config.METRICS_HTTP_PORT:
+        METRICS.serve(config.METRICS_HTTP_PORT)
+    schedule = ClassSchedule(db)
+    schedule.refresh()
+    engine = MultiCameraEngine(load_known_faces(db), schedule, AttendanceWriter(db), args.workers)
+    for spec in args.camera:
+        source, room = parse_camera(spec)
+        engine.add_camera(source, room, args.target_fps)
+    engine.start()
+
+    last_refresh = time.monotonic()
+    try:
+        while any(camera.grabber.running for camera in engine.cameras):
+            time.sleep(config.ATTENDANCE_FLUSH_SECONDS)
+            engine.attendance.flush_if_due()
+            if time.monotonic() - last_refresh >= config.SCHEDULE_REFRESH_SECONDS:
+                schedule.refresh()
+                last_refresh = time.monotonic()
+            if METRICS.enabled and config.METRICS_FILE:
+                METRICS.write_file(config.METRICS_FILE)
+            for camera in engine.cameras:
+                print(f"{camera.source}: {camera.frames_processed} processed, {camera.frames_dropped} dropped")
+    except KeyboardInterrupt:
+        pass
+    finally:
+        engine.stop()
+        db.close()
@@ -0,0 +1,83 @@
+import os
+import threading
+import time
+import cv2
+from metrics import METRICS
+
+
+class FrameGrabber(threading.Thread):
+    """
+    Reads a capture source on its own thread and keeps only the newest frame.
+    Consumers that fall behind simply see a later frame; stale frames are
+    overwritten instead of queuing up. Video files are played back at
+    their own frame rate, like a live camera, instead of being decoded as
+    fast as the CPU allows.
+    """
+
+    def __init__(self, source=0):
+        super().__init__(daemon=True)
+        self.source = source
+        self.capture = cv2.VideoCapture(source)
+        self.frames_captured = 0
+        self.frame_interval = None
+        if isinstance(source, str) and os.path.isfile(source):
+            fps = self.capture.get(cv2.CAP_PROP_FPS)
+            self.frame_interval = 1.0 / fps if fps > 0 else None
+        self._frame = None
+        self._seq = 0
+        self._running = True
+        self._condition = threading.Condition()
+
+    def is_opened(self):
+        return self.capture.isOpened()
+
+    @property
+    def running(self):
+        return self._running
+
+    def run(self):
+        next_frame = time.monotonic()
+        while self._running:
+            ret, frame = self.capture.read()
+            if not ret:
+                break
+            with self._condition:
+                self._frame = frame
+                self._seq += 1
+                self.frames_captured += 1
+                self._condition.notify_all()
+            METRICS.count("frames_captured")
+            if self.frame_interval is not None:
+                next_frame += self.frame_interval
+                delay = next_frame - time.monotonic()
+                if delay > 0:
+                    time.sleep(delay)
+                elif delay < -self.frame_interval:
+                    # Fell behind (slow decode); carry on from now rather than racing to catch up
+                    next_frame = time.monotonic()
+        with self._condition:
+            self._running = False
+            self._condition.notify_all()
+        self.capture.release()
+
+    def latest(self, after_seq=0, timeout=None):
+        """
+        Return (seq, frame) for the newest frame.
+        Blocks up to timeout seconds for a frame newer than after_seq;
+        returns (after_seq, None) if none arrives or capture has stopped.
+        """
+        with self._condition:
+            if timeout:
+                self._condition.wait_for(lambda: self._seq > after_seq or not self._running, timeout)
+            if self._seq <= after_seq:
+                return after_seq, None
+            return self._seq, self._frame
+
+    def stop(self):
+        with self._condition:
+            self._running = False
+            self._condition.notify_all()
+        if self.is_alive():
+            self.join()
+        else:
+            self.capture.release()
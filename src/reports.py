@@ -0,0 +1,63 @@
+"""
+Attendance reports from the summary tables.
+
+    python src/reports.py classes --since 2026-09-01 --output classes.csv
+    python src/reports.py students --since 2026-09-01 --until 2026-12-20
+    python src/reports.py rebuild
+
+The summaries are kept current as attendance is written, so reports read
+one row per class and day (or student and day) instead of every mark.
+`rebuild` recomputes them from the attendance table after a backfill or
+manual edit.
+"""
+import argparse
+import csv
+import sys
+from datetime import date
+
+from storage import create_database, StorageError
+
+
+def class_report(db, since=None, until=None):
+    header = ["class_id", "subject", "date", "present", "first_mark", "last_mark"]
+    rows = [
+        [class_id, subject, day.isoformat(), present, first_mark.isoformat(sep=" "), last_mark.isoformat(sep=" ")]
+        for class_id, subject, day, present, first_mark, last_mark in db.fetch_class_summaries(since, until)
+    ]
+    return header, rows
+
+
+def student_report(db, since=None, until=None):
+    header = ["student_id", "name", "days_present", "classes_attended"]
+    return header, [list(row) for row in db.fetch_student_summaries(since, until)]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export attendance summaries or rebuild them.")
+    parser.add_argument("report", choices=["classes", "students", "rebuild"])
+    parser.add_argument("--since", type=date.fromisoformat, default=None, help="first day to include, e.g. 2026-09-01")
+    parser.add_argument("--until", type=date.fromisoformat, default=None, help="last day to include")
+    parser.add_argument("--output", help="CSV file to write (default: standard output)")
+    args = parser.parse_args()
+
+    try:
+        db = create_database()
+    except StorageError as err:
+        print(err)
+        sys.exit(1)
+    if args.report == "rebuild":
+        print(f"Rebuilt summaries: {db.rebuild_attendance_summaries()} class-day rows.")
+    else:
+        report = class_report if args.report == "classes" else student_report
+        header, rows = report(db, args.since, args.until)
+        if args.output:
+            with open(args.output, "w", newline="") as f:
+                writer = csv.writer(f)
+                writer.writerow(header)
+                writer.writerows(rows)
+            print(f"Wrote {len(rows)} rows to {args.output}")
+        else:
+            writer = csv.writer(sys.stdout)
+            writer.writerow(header)
+            writer.writerows(rows)
+    db.close()
@@ -0,0 +1,80 @@
+import bisect
+import threading
+from collections import namedtuple
+from datetime import datetime
+
+from storage import StorageError
+
+ScheduledClass = namedtuple("ScheduledClass", ["id", "subject", "start_time", "end_time", "room"])
+
+
+class ClassSchedule:
+    """
+    In-process interval index over the classes table.
+    Class start/end times split the timeline into segments, each holding the
+    classes running during it, so an active-class lookup is one bisect and
+    never touches the database. Overlapping classes are supported; a class
+    with no room applies to every camera.
+    """
+
+    def __init__(self, db):
+        self.db = db
+        self._bounds = []
+        self._segments = []
+        self._lock = threading.Lock()
+        self.loaded_at = None
+
+    def refresh(self, now=None):
+        """
+        Reload classes that have not ended yet and rebuild the index.
+        When the database cannot be reached the previous index is kept and
+        False is returned, so periodic refreshes survive an outage.
+        """
+        now = now or datetime.now()
+        try:
+            classes = self.db.fetch_classes(ending_after=now)
+        except StorageError as err:
+            print(f"Keeping the previous class schedule: {err}")
+            return False
+        self.build(classes)
+        self.loaded_at = now
+        return True
+
+    def build(self, classes):
+        events = []
+        for scheduled in classes:
+            scheduled = ScheduledClass(*scheduled)
+            if scheduled.start_time < scheduled.end_time:
+                events.append((scheduled.start_time, 1, scheduled))
+                events.append((scheduled.end_time, 0, scheduled))
+        events.sort(key=lambda event: (event[0], event[1]))
+
+        # Sweep the boundaries, recording the classes active in each segment
+        bounds, segments, active = [], [], {}
+        for time, starting, scheduled in events:
+            if starting:
+                active[scheduled.id] = scheduled
+            else:
+                active.pop(scheduled.id, None)
+            segment = tuple(sorted(active.values(), key=lambda c: (c.start_time, c.id)))
+            if bounds and bounds[-1] == time:
+                segments[-1] = segment
+            else:
+                bounds.append(time)
+                segments.append(segment)
+
+        with self._lock:
+            self._bounds, self._segments = bounds, segments
+
+    def active_classes(self, now, room=None):
+        """Classes running at `now` (start <= now < end), earliest start first."""
+        with self._lock:
+            bounds, segments = self._bounds, self._segments
+        i = bisect.bisect_right(bounds, now) - 1
+        if i < 0:
+            return []
+        return [c for c in segments[i] if room is None or c.room is None or c.room == room]
+
+    def active_class_id(self, now, room=None):
+        classes = self.active_classes(now, room)
+        return classes[0].id if classes else None
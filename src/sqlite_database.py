@@ -0,0 +1,483 @@
+import sqlite3
+import threading
+from contextlib import contextmanager
+from datetime import date, datetime
+
+import numpy as np
+
+import config
+from metrics import METRICS
+from storage import Storage, StorageError, date_range, encoding_list, page_filters, placeholders, summary_keys
+from utils import encode_face_encoding, decode_face_encoding, is_legacy_blob
+
+
+def _to_db(value):
+    """Dates and datetimes are stored as ISO strings."""
+    return value.isoformat(sep=" ") if isinstance(value, datetime) else value.isoformat()
+
+
+class SQLiteDatabase(Storage):
+    """
+    Embedded storage for self-contained kiosks.
+    Runs in WAL mode so recognition, the admin portal and the attendance
+    writer can read while a batch is being written. Each thread gets its own
+    connection to the same file.
+    """
+
+    def __init__(self, path=None):
+        self.path = path or config.SQLITE_PATH
+        self._local = threading.local()
+        try:
+            with self._cursor() as cursor:
+                cursor.execute("PRAGMA journal_mode=WAL")
+        except sqlite3.Error as err:
+            raise StorageError(f"Could not open SQLite database {self.path}: {err}") from err
+        self.create_tables()
+
+    def _connection(self):
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=config.DB_POOL_TIMEOUT)
+            connection.execute("PRAGMA synchronous=NORMAL")
+            connection.execute("PRAGMA foreign_keys=ON")
+            self._local.connection = connection
+        return connection
+
+    @contextmanager
+    def _cursor(self, stage="db_other"):
+        """
+        Cursor on this thread's connection, committed when the block exits
+        cleanly and rolled back otherwise.
+        """
+        with METRICS.timer(stage):
+            connection = self._connection()
+            cursor = connection.cursor()
+            try:
+                yield cursor
+                connection.commit()
+            except Exception:
+                connection.rollback()
+                raise
+            finally:
+                cursor.close()
+
+    def create_tables(self):
+        try:
+            with self._cursor() as cursor:
+                cursor.executescript("""
+                    CREATE TABLE IF NOT EXISTS students (
+                        id INTEGER PRIMARY KEY AUTOINCREMENT,
+                        name TEXT,
+                        face_encoding BLOB,
+                        enrollment_key TEXT UNIQUE,
+                        created_at TEXT DEFAULT CURRENT_TIMESTAMP
+                    );
+                    CREATE INDEX IF NOT EXISTS idx_students_name ON students (name);
+                    CREATE TABLE IF NOT EXISTS face_encodings (
+                        id INTEGER PRIMARY KEY AUTOINCREMENT,
+                        student_id INTEGER NOT NULL REFERENCES students(id) ON DELETE CASCADE,
+                        face_encoding BLOB,
+                        created_at TEXT DEFAULT CURRENT_TIMESTAMP
+                    );
+                    CREATE INDEX IF NOT EXISTS idx_face_encodings_student ON face_encodings (student_id);
+                    CREATE TABLE IF NOT EXISTS classes (
+                        id INTEGER PRIMARY KEY AUTOINCREMENT,
+                        subject TEXT,
+                        start_time TEXT,
+                        end_time TEXT,
+                        room TEXT,
+                        created_at TEXT DEFAULT CURRENT_TIMESTAMP
+                    );
+                    CREATE INDEX IF NOT EXISTS idx_classes_end_time ON classes (end_time);
+                    CREATE TABLE IF NOT EXISTS attendance (
+                        id INTEGER PRIMARY KEY AUTOINCREMENT,
+                        student_id INTEGER REFERENCES students(id),
+                        class_id INTEGER REFERENCES classes(id),
+                        timestamp TEXT,
+                        attendance_date TEXT,
+                        UNIQUE (student_id, class_id, attendance_date)
+                    );
+                    CREATE INDEX IF NOT EXISTS idx_attendance_class_date ON attendance (class_id, attendance_date);
+                    -- SQLite appends the rowid (id) to every index, so this also orders ties by id
+                    CREATE INDEX IF NOT EXISTS idx_attendance_timestamp ON attendance (timestamp);
+                    CREATE INDEX IF NOT EXISTS idx_attendance_class_timestamp ON attendance (class_id, timestamp);
+                    CREATE INDEX IF NOT EXISTS idx_attendance_student_date ON attendance (student_id, attendance_date);
+                    CREATE TABLE IF NOT EXISTS class_attendance_summary (
+                        class_id INTEGER,
+                        attendance_date TEXT,
+                        present_count INTEGER NOT NULL,
+                        first_mark TEXT,
+                        last_mark TEXT,
+                        PRIMARY KEY (class_id, attendance_date)
+                    );
+                    CREATE INDEX IF NOT EXISTS idx_class_summary_date ON class_attendance_summary (attendance_date);
+                    CREATE TABLE IF NOT EXISTS student_attendance_daily (
+                        student_id INTEGER,
+                        attendance_date TEXT,
+                        classes_attended INTEGER NOT NULL,
+                        PRIMARY KEY (student_id, attendance_date)
+                    );
+                    CREATE INDEX IF NOT EXISTS idx_student_daily_date ON student_attendance_daily (attendance_date);
+                """)
+            with self._cursor() as cursor:
+                self._copy_student_encodings(cursor)
+            with self._cursor() as cursor:
+                cursor.execute("SELECT EXISTS (SELECT 1 FROM attendance), EXISTS (SELECT 1 FROM class_attendance_summary)")
+                has_attendance, has_summaries = cursor.fetchone()
+                if has_attendance and not has_summaries:
+                    self._rebuild_summaries(cursor)
+        except sqlite3.Error as err:
+            raise StorageError(f"Failed creating tables: {err}") from err
+
+    def _copy_student_encodings(self, cursor, after_id=0):
+        """Give students without samples their students.face_encoding as the first sample."""
+        cursor.execute("""
+            INSERT INTO face_encodings (student_id, face_encoding)
+            SELECT s.id, s.face_encoding FROM students s
+            WHERE s.id > ? AND s.face_encoding IS NOT NULL
+              AND NOT EXISTS (SELECT 1 FROM face_encodings f WHERE f.student_id = s.id)
+            ORDER BY s.id
+        """, (after_id,))
+
+    def _insert_samples(self, cursor, student_id, samples):
+        sample_ids = []
+        for face_encoding in samples:
+            cursor.execute(
+                "INSERT INTO face_encodings (student_id, face_encoding) VALUES (?, ?)",
+                (student_id, encode_face_encoding(face_encoding)),
+            )
+            sample_ids.append(cursor.lastrowid)
+        return sample_ids
+
+    def insert_student(self, name, face_encodings):
+        samples = encoding_list(face_encodings)
+        try:
+            with self._cursor() as cursor:
+                cursor.execute(
+                    "INSERT INTO students (name, face_encoding) VALUES (?, ?)",
+                    (name, encode_face_encoding(np.mean(samples, axis=0))),
+                )
+                student_id = cursor.lastrowid
+                self._insert_samples(cursor, student_id, samples)
+                return student_id
+        except sqlite3.Error as err:
+            print(f"Error inserting student: {err}")
+            return None
+
+    def insert_students_batch(self, students):
+        rows = [(name, encode_face_encoding(face_encoding), key) for name, face_encoding, key in students]
+        if not rows:
+            return 0
+        try:
+            with self._cursor() as cursor:
+                cursor.execute("SELECT COALESCE(MAX(id), 0) FROM students")
+                after_id = cursor.fetchone()[0]
+                cursor.executemany(
+                    "INSERT OR IGNORE INTO students (name, face_encoding, enrollment_key) VALUES (?, ?, ?)", rows
+                )
+                inserted = cursor.rowcount
+                self._copy_student_encodings(cursor, after_id)
+                return inserted
+        except sqlite3.Error as err:
+            print(f"Error inserting students: {err}")
+            return None
+
+    def _update_mean(self, cursor, student_id):
+        """Reset students.face_encoding to the mean of the student's samples."""
+        cursor.execute("SELECT face_encoding FROM face_encodings WHERE student_id = ?", (student_id,))
+        samples = [decode_face_encoding(row[0]) for row in cursor.fetchall()]
+        if samples:
+            cursor.execute(
+                "UPDATE students SET face_encoding = ? WHERE id = ?",
+                (encode_face_encoding(np.mean(samples, axis=0)), student_id),
+            )
+
+    def add_face_encodings(self, student_id, face_encodings):
+        try:
+            with self._cursor() as cursor:
+                sample_ids = self._insert_samples(cursor, student_id, encoding_list(face_encodings))
+                self._update_mean(cursor, student_id)
+                return sample_ids
+        except sqlite3.Error as err:
+            print(f"Error adding face encodings: {err}")
+            return None
+
+    def delete_face_encoding(self, sample_id):
+        try:
+            with self._cursor() as cursor:
+                cursor.execute("""
+                    SELECT f.student_id, COUNT(*) FROM face_encodings f
+                    JOIN face_encodings o ON o.student_id = f.student_id
+                    WHERE f.id = ? GROUP BY f.student_id
+                """, (sample_id,))
+                row = cursor.fetchone()
+                if row is None:
+                    return False
+                student_id, samples = row
+                if samples < 2:
+                    print("Cannot delete a student's last face sample.")
+                    return False
+                cursor.execute("DELETE FROM face_encodings WHERE id = ?", (sample_id,))
+                self._update_mean(cursor, student_id)
+                return True
+        except sqlite3.Error as err:
+            print(f"Error deleting face encoding: {err}")
+            return False
+
+    def fetch_face_encodings(self, since_id=0):
+        try:
+            with self._cursor(stage="db_fetch_students") as cursor:
+                cursor.execute("""
+                    SELECT f.id, f.student_id, s.name, f.face_encoding
+                    FROM face_encodings f
+                    JOIN students s ON f.student_id = s.id
+                    WHERE f.id > ? ORDER BY f.id
+                """, (since_id,))
+                records = cursor.fetchall()
+            return [
+                (sample_id, student_id, name, decode_face_encoding(blob))
+                for sample_id, student_id, name, blob in records
+            ]
+        except sqlite3.Error as err:
+            print(f"Error fetching face encodings: {err}")
+            return []
+
+    def fetch_face_encoding_ids(self):
+        try:
+            with self._cursor() as cursor:
+                cursor.execute("SELECT id FROM face_encodings")
+                return {row[0] for row in cursor.fetchall()}
+        except sqlite3.Error as err:
+            raise StorageError(f"Error fetching sample ids: {err}") from err
+
+    def fetch_student_samples(self, student_id):
+        try:
+            with self._cursor() as cursor:
+                cursor.execute(
+                    "SELECT id, created_at FROM face_encodings WHERE student_id = ? ORDER BY id", (student_id,)
+                )
+                records = cursor.fetchall()
+            return [(sample_id, datetime.fromisoformat(created_at)) for sample_id, created_at in records]
+        except sqlite3.Error as err:
+            print(f"Error fetching samples: {err}")
+            return []
+
+    def fetch_enrollment_keys(self):
+        try:
+            with self._cursor() as cursor:
+                cursor.execute("SELECT enrollment_key FROM students WHERE enrollment_key IS NOT NULL")
+                return {row[0] for row in cursor.fetchall()}
+        except sqlite3.Error as err:
+            raise StorageError(f"Error fetching enrollment keys: {err}") from err
+
+    def fetch_students(self, since_id=0):
+        try:
+            with self._cursor(stage="db_fetch_students") as cursor:
+                cursor.execute(
+                    "SELECT id, name, face_encoding FROM students WHERE id > ? ORDER BY id", (since_id,)
+                )
+                records = cursor.fetchall()
+            return [(student_id, name, decode_face_encoding(blob)) for student_id, name, blob in records]
+        except sqlite3.Error as err:
+            print(f"Error fetching students: {err}")
+            return []
+
+    def migrate_encodings(self, fmt=None, batch_size=500):
+        try:
+            migrated = 0
+            for table in ("students", "face_encodings"):
+                with self._cursor() as cursor:
+                    cursor.execute(f"SELECT id, face_encoding FROM {table}")
+                    records = cursor.fetchall()
+                updates = [
+                    (encode_face_encoding(decode_face_encoding(blob), fmt), row_id)
+                    for row_id, blob in records
+                    if blob is not None and is_legacy_blob(blob)
+                ]
+                for start in range(0, len(updates), batch_size):
+                    with self._cursor() as cursor:
+                        cursor.executemany(
+                            f"UPDATE {table} SET face_encoding = ? WHERE id = ?", updates[start:start + batch_size]
+                        )
+                migrated += len(updates)
+            return migrated
+        except sqlite3.Error as err:
+            print(f"Error migrating encodings: {err}")
+            return 0
+
+    def insert_class(self, subject, start_time, end_time, room=None):
+        try:
+            with self._cursor() as cursor:
+                cursor.execute(
+                    "INSERT INTO classes (subject, start_time, end_time, room) VALUES (?, ?, ?, ?)",
+                    (subject, _to_db(start_time), _to_db(end_time), room),
+                )
+                return cursor.lastrowid
+        except sqlite3.Error as err:
+            print(f"Error scheduling class: {err}")
+            return None
+
+    def fetch_classes(self, ending_after):
+        try:
+            with self._cursor(stage="db_fetch_classes") as cursor:
+                cursor.execute(
+                    "SELECT id, subject, start_time, end_time, room FROM classes WHERE end_time > ?",
+                    (_to_db(ending_after),),
+                )
+                records = cursor.fetchall()
+        except sqlite3.Error as err:
+            raise StorageError(f"Error fetching classes: {err}") from err
+        return [
+            (class_id, subject, datetime.fromisoformat(start), datetime.fromisoformat(end), room)
+            for class_id, subject, start, end, room in records
+        ]
+
+    def fetch_attendance_marks(self, class_id, attendance_date):
+        try:
+            with self._cursor(stage="db_attendance_marks") as cursor:
+                cursor.execute(
+                    "SELECT student_id FROM attendance WHERE class_id = ? AND attendance_date = ?",
+                    (class_id, _to_db(attendance_date)),
+                )
+                return {row[0] for row in cursor.fetchall()}
+        except sqlite3.Error as err:
+            raise StorageError(f"Error fetching attendance marks: {err}") from err
+
+    def insert_attendance_batch(self, marks):
+        if not marks:
+            return True
+        try:
+            with self._cursor(stage="db_attendance_write") as cursor:
+                cursor.executemany(
+                    "INSERT OR IGNORE INTO attendance (student_id, class_id, timestamp, attendance_date) "
+                    "VALUES (?, ?, ?, ?)",
+                    [(student_id, class_id, _to_db(timestamp), _to_db(timestamp.date()))
+                     for student_id, class_id, timestamp in marks],
+                )
+                self._refresh_summaries(cursor, *summary_keys(marks))
+            return True
+        except sqlite3.Error as err:
+            print(f"Error recording attendance: {err}")
+            return False
+
+    def _refresh_summaries(self, cursor, class_ids, student_ids, dates):
+        """Recompute the summary rows for the given keys from attendance."""
+        dates = [_to_db(day) for day in dates]
+        days = placeholders(len(dates), "?")
+        cursor.execute(f"""
+            INSERT INTO class_attendance_summary (class_id, attendance_date, present_count, first_mark, last_mark)
+            SELECT class_id, attendance_date, COUNT(*), MIN(timestamp), MAX(timestamp)
+            FROM attendance
+            WHERE class_id IN ({placeholders(len(class_ids), "?")}) AND attendance_date IN ({days})
+            GROUP BY class_id, attendance_date
+            ON CONFLICT (class_id, attendance_date) DO UPDATE SET present_count = excluded.present_count,
+                first_mark = excluded.first_mark, last_mark = excluded.last_mark
+        """, class_ids + dates)
+        cursor.execute(f"""
+            INSERT INTO student_attendance_daily (student_id, attendance_date, classes_attended)
+            SELECT student_id, attendance_date, COUNT(*)
+            FROM attendance
+            WHERE student_id IN ({placeholders(len(student_ids), "?")}) AND attendance_date IN ({days})
+            GROUP BY student_id, attendance_date
+            ON CONFLICT (student_id, attendance_date) DO UPDATE SET classes_attended = excluded.classes_attended
+        """, student_ids + dates)
+
+    def _rebuild_summaries(self, cursor):
+        cursor.execute("DELETE FROM class_attendance_summary")
+        cursor.execute("""
+            INSERT INTO class_attendance_summary (class_id, attendance_date, present_count, first_mark, last_mark)
+            SELECT class_id, attendance_date, COUNT(*), MIN(timestamp), MAX(timestamp)
+            FROM attendance GROUP BY class_id, attendance_date
+        """)
+        rows = cursor.rowcount
+        cursor.execute("DELETE FROM student_attendance_daily")
+        cursor.execute("""
+            INSERT INTO student_attendance_daily (student_id, attendance_date, classes_attended)
+            SELECT student_id, attendance_date, COUNT(*)
+            FROM attendance GROUP BY student_id, attendance_date
+        """)
+        return rows
+
+    def rebuild_attendance_summaries(self):
+        with self._cursor() as cursor:
+            return self._rebuild_summaries(cursor)
+
+    def fetch_class_summaries(self, since=None, until=None, limit=None):
+        where, params = date_range("cs.attendance_date", since, until, "?")
+        params = [_to_db(param) for param in params]
+        query = f"""
+            SELECT cs.class_id, c.subject, cs.attendance_date, cs.present_count, cs.first_mark, cs.last_mark
+            FROM class_attendance_summary cs
+            JOIN classes c ON cs.class_id = c.id
+            {where}
+            ORDER BY cs.attendance_date DESC, c.start_time DESC, cs.class_id DESC
+        """
+        if limit is not None:
+            query += " LIMIT ?"
+            params.append(limit)
+        try:
+            with self._cursor(stage="db_attendance_summary") as cursor:
+                cursor.execute(query, params)
+                records = cursor.fetchall()
+            return [
+                (class_id, subject, date.fromisoformat(day), count,
+                 datetime.fromisoformat(first_mark), datetime.fromisoformat(last_mark))
+                for class_id, subject, day, count, first_mark, last_mark in records
+            ]
+        except sqlite3.Error as err:
+            print(f"Error fetching class summaries: {err}")
+            return []
+
+    def fetch_student_summaries(self, since=None, until=None):
+        where, params = date_range("d.attendance_date", since, until, "?")
+        try:
+            with self._cursor(stage="db_attendance_summary") as cursor:
+                cursor.execute(f"""
+                    SELECT d.student_id, s.name, COUNT(*), SUM(d.classes_attended)
+                    FROM student_attendance_daily d
+                    JOIN students s ON d.student_id = s.id
+                    {where}
+                    GROUP BY d.student_id, s.name
+                    ORDER BY s.name
+                """, [_to_db(param) for param in params])
+                return cursor.fetchall()
+        except sqlite3.Error as err:
+            print(f"Error fetching student summaries: {err}")
+            return []
+
+    def fetch_attendance_page(self, limit, before=None, since=None, until=None, class_id=None, student_name=None):
+        where, params = page_filters(before, since, until, class_id, student_name, "?")
+        params = [_to_db(param) if isinstance(param, date) else param for param in params]
+        try:
+            with self._cursor(stage="db_attendance_page") as cursor:
+                cursor.execute(f"""
+                    SELECT a.id, s.name, c.subject, a.timestamp
+                    FROM attendance a
+                    JOIN students s ON a.student_id = s.id
+                    JOIN classes c ON a.class_id = c.id
+                    {where}
+                    ORDER BY a.timestamp DESC, a.id DESC
+                    LIMIT ?
+                """, params + [limit])
+                records = cursor.fetchall()
+            return [(mark_id, name, subject, datetime.fromisoformat(timestamp))
+                    for mark_id, name, subject, timestamp in records]
+        except sqlite3.Error as err:
+            print(f"Error fetching attendance: {err}")
+            return []
+
+    def fetch_class_list(self, limit=500):
+        try:
+            with self._cursor() as cursor:
+                cursor.execute("SELECT id, subject, start_time FROM classes ORDER BY start_time DESC LIMIT ?", (limit,))
+                records = cursor.fetchall()
+            return [(class_id, subject, datetime.fromisoformat(start)) for class_id, subject, start in records]
+        except sqlite3.Error as err:
+            print(f"Error fetching classes: {err}")
+            return []
+
+    def close(self):
+        connection = getattr(self._local, "connection", None)
+        if connection is not None:
+            connection.close()
+            self._local.connection = None
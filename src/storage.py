@@ -0,0 +1,225 @@
+import numpy as np
+
+import config
+
+
+class StorageError(Exception):
+    """Raised when the storage backend cannot be opened or initialized."""
+
+
+class Storage:
+    """
+    Interface shared by the storage backends for students, classes and
+    attendance. Implementations must be safe to call from several threads.
+    """
+
+    def create_tables(self):
+        raise NotImplementedError
+
+    # Students
+
+    def insert_student(self, name, face_encodings):
+        """
+        Insert a student with one or more face encodings (samples) and
+        return the new student id, or None on failure. A single encoding is
+        accepted too.
+        """
+        raise NotImplementedError
+
+    def insert_students_batch(self, students):
+        """
+        Insert (name, face_encoding, enrollment_key) rows in one transaction,
+        skipping existing enrollment keys, each with its encoding as the
+        first sample. Returns the number inserted, or None on failure.
+        """
+        raise NotImplementedError
+
+    def fetch_enrollment_keys(self):
+        """
+        Enrollment keys of every student added by bulk enrollment.
+        Raises StorageError when the database cannot be read.
+        """
+        raise NotImplementedError
+
+    def fetch_students(self, since_id=0):
+        """Fetch (id, name, face_encoding) rows with an id above since_id."""
+        raise NotImplementedError
+
+    def migrate_encodings(self, fmt=None, batch_size=500):
+        """Rewrite legacy float64 encoding blobs; returns the number rewritten."""
+        raise NotImplementedError
+
+    # Face encoding samples
+
+    def add_face_encodings(self, student_id, face_encodings):
+        """Add samples to a student; returns the new sample ids, or None on failure."""
+        raise NotImplementedError
+
+    def delete_face_encoding(self, sample_id):
+        """
+        Remove one sample and update the student's mean encoding. Returns
+        False if the sample does not exist or is the student's last one.
+        """
+        raise NotImplementedError
+
+    def fetch_face_encodings(self, since_id=0):
+        """(sample_id, student_id, name, face_encoding) rows with a sample id above since_id."""
+        raise NotImplementedError
+
+    def fetch_face_encoding_ids(self):
+        """
+        Ids of every stored sample.
+        Raises StorageError when the database cannot be read.
+        """
+        raise NotImplementedError
+
+    def fetch_student_samples(self, student_id):
+        """(sample_id, created_at) of a student's samples, oldest first."""
+        raise NotImplementedError
+
+    # Classes
+
+    def insert_class(self, subject, start_time, end_time, room=None):
+        """Schedule a class and return its id, or None on failure."""
+        raise NotImplementedError
+
+    def fetch_classes(self, ending_after):
+        """
+        (id, subject, start_time, end_time, room) for classes not yet over.
+        Raises StorageError when the database cannot be read.
+        """
+        raise NotImplementedError
+
+    # Attendance
+
+    def fetch_attendance_marks(self, class_id, attendance_date):
+        """
+        Student ids already marked present for a class on a date.
+        Raises StorageError when the database cannot be read.
+        """
+        raise NotImplementedError
+
+    def insert_attendance_batch(self, marks):
+        """
+        Insert (student_id, class_id, timestamp) marks in one transaction,
+        ignoring marks already present for the same class and day.
+        Returns True on success.
+        """
+        raise NotImplementedError
+
+    def fetch_attendance_page(self, limit, before=None, since=None, until=None, class_id=None, student_name=None):
+        """
+        One page of (id, student name, subject, timestamp) marks, newest
+        first. `before` is the (timestamp, id) of the last row of the
+        previous page. since/until bound the timestamp (until exclusive)
+        and student_name matches a name prefix.
+        """
+        raise NotImplementedError
+
+    def fetch_class_summaries(self, since=None, until=None, limit=None):
+        """
+        (class_id, subject, attendance_date, present_count, first_mark,
+        last_mark) per class and day from the summary table, newest first.
+        since/until are inclusive dates.
+        """
+        raise NotImplementedError
+
+    def fetch_student_summaries(self, since=None, until=None):
+        """
+        (student_id, name, days_present, classes_attended) per student from
+        the daily summary table, ordered by name. since/until are inclusive
+        dates.
+        """
+        raise NotImplementedError
+
+    def rebuild_attendance_summaries(self):
+        """
+        Recompute the summary tables from the attendance table, for
+        backfills. Returns the number of class-day rows written.
+        """
+        raise NotImplementedError
+
+    def fetch_class_list(self, limit=500):
+        """(id, subject, start_time) of the most recent classes, newest first."""
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+
+def encoding_list(face_encodings):
+    """A single encoding or a sequence of encodings as a list of 1-D arrays."""
+    array = np.asarray(face_encodings)
+    return [array] if array.ndim == 1 else list(array)
+
+
+def like_prefix(text):
+    """LIKE pattern matching values that start with text, with wildcards escaped."""
+    return text.replace("!", "!!").replace("%", "!%").replace("_", "!_") + "%"
+
+
+def page_filters(before, since, until, class_id, student_name, placeholder):
+    """
+    SQL conditions and parameters shared by the backends' attendance page
+    queries, over attendance `a` joined with students `s`.
+    """
+    conditions, params = [], []
+    if before is not None:
+        # The leading plain range lets both backends walk the timestamp index in order
+        conditions.append(f"a.timestamp <= {placeholder} AND (a.timestamp < {placeholder} OR a.id < {placeholder})")
+        params += [before[0], before[0], before[1]]
+    if since is not None:
+        conditions.append(f"a.timestamp >= {placeholder}")
+        params.append(since)
+    if until is not None:
+        conditions.append(f"a.timestamp < {placeholder}")
+        params.append(until)
+    if class_id is not None:
+        conditions.append(f"a.class_id = {placeholder}")
+        params.append(class_id)
+    if student_name:
+        conditions.append(f"s.name LIKE {placeholder} ESCAPE '!'")
+        params.append(like_prefix(student_name))
+    where = "WHERE " + " AND ".join(conditions) if conditions else ""
+    return where, params
+
+
+def date_range(column, since, until, placeholder):
+    """WHERE clause and parameters for an inclusive date range on column."""
+    conditions, params = [], []
+    if since is not None:
+        conditions.append(f"{column} >= {placeholder}")
+        params.append(since)
+    if until is not None:
+        conditions.append(f"{column} <= {placeholder}")
+        params.append(until)
+    where = "WHERE " + " AND ".join(conditions) if conditions else ""
+    return where, params
+
+
+def summary_keys(marks):
+    """
+    Class ids, student ids and dates touched by a batch of (student_id,
+    class_id, timestamp) marks. The summaries are recomputed for every
+    combination of these, which is a small superset of the changed keys.
+    """
+    class_ids = sorted({class_id for _, class_id, _ in marks})
+    student_ids = sorted({student_id for student_id, _, _ in marks})
+    dates = sorted({timestamp.date() for _, _, timestamp in marks})
+    return class_ids, student_ids, dates
+
+
+def placeholders(count, placeholder):
+    return ", ".join([placeholder] * count)
+
+
+def create_database(backend=None):
+    """Open the storage backend selected by config.DB_BACKEND."""
+    backend = backend or config.DB_BACKEND
+    if backend == "mysql":
+        from database import Database
+        return Database()
+    if backend == "sqlite":
+        from sqlite_database import SQLiteDatabase
+        return SQLiteDatabase(config.SQLITE_PATH)
+    raise StorageError(f"Unknown database backend: {backend}")
@@ -0,0 +1,131 @@
+import itertools
+import cv2
+import numpy as np
+
+
+def iou(a, b):
+    """Intersection over union of two (top, right, bottom, left) boxes."""
+    top, bottom = max(a[0], b[0]), min(a[2], b[2])
+    left, right = max(a[3], b[3]), min(a[1], b[1])
+    if bottom <= top or right <= left:
+        return 0.0
+    intersection = (bottom - top) * (right - left)
+    area_a = (a[2] - a[0]) * (a[1] - a[3])
+    area_b = (b[2] - b[0]) * (b[1] - b[3])
+    return intersection / float(area_a + area_b - intersection)
+
+
+class Track:
+    """A face followed across frames, carrying its last known identity."""
+
+    _ids = itertools.count(1)
+
+    def __init__(self, location):
+        self.id = next(Track._ids)
+        self.location = location
+        self.student_id = None
+        self.name = None
+        self.distance = None
+        self.encoded_at = None
+        self.misses = 0
+        self.lost = False
+        self.liveness = None
+
+    def needs_encoding(self, now, identity_ttl, unknown_retry):
+        """New tracks and tracks whose identity has expired are re-encoded."""
+        if self.encoded_at is None:
+            return True
+        ttl = identity_ttl if self.student_id is not None else unknown_retry
+        return now - self.encoded_at >= ttl
+
+    def set_identity(self, student_id, name, distance, now):
+        self.student_id = student_id
+        self.name = name
+        self.distance = distance
+        self.encoded_at = now
+
+
+class FaceTracker:
+    """
+    IoU tracker over face boxes.
+    Detections on keyframes are greedily matched to existing tracks;
+    between keyframes boxes can be carried forward with sparse optical flow.
+    """
+
+    def __init__(self, iou_threshold=0.3, max_misses=2):
+        self.iou_threshold = iou_threshold
+        self.max_misses = max_misses
+        self.tracks = []
+
+    def update(self, locations):
+        """
+        Match keyframe detections to tracks, opening tracks for new faces and
+        dropping tracks that went unmatched for too many keyframes.
+        Returns the list of tracks aligned with locations.
+        """
+        pairs = sorted(
+            ((iou(track.location, location), t, d)
+             for t, track in enumerate(self.tracks)
+             for d, location in enumerate(locations)),
+            reverse=True,
+        )
+        assigned = [None] * len(locations)
+        used = set()
+        for overlap, t, d in pairs:
+            if overlap < self.iou_threshold:
+                break
+            if t in used or assigned[d] is not None:
+                continue
+            used.add(t)
+            assigned[d] = self.tracks[t]
+
+        for t, track in enumerate(self.tracks):
+            if t not in used:
+                track.misses += 1
+
+        for d, location in enumerate(locations):
+            if assigned[d] is None:
+                assigned[d] = Track(location)
+                self.tracks.append(assigned[d])
+            assigned[d].location = location
+            assigned[d].misses = 0
+            assigned[d].lost = False
+
+        self.tracks = [track for track in self.tracks if track.misses <= self.max_misses]
+        return assigned
+
+    def propagate(self, prev_gray, gray, scale=1.0):
+        """
+        Shift every track box by the median optical flow of corner points
+        inside it. Grayscale frames may be downscaled by `scale`.
+        Returns False if any track could not be followed.
+        """
+        ok = True
+        height, width = gray.shape[:2]
+        for track in self.tracks:
+            top, right, bottom, left = (int(v * scale) for v in track.location)
+            top, left = max(top, 0), max(left, 0)
+            bottom, right = min(bottom, height), min(right, width)
+            if bottom - top < 4 or right - left < 4:
+                track.lost = True
+                ok = False
+                continue
+
+            points = cv2.goodFeaturesToTrack(prev_gray[top:bottom, left:right], 20, 0.01, 3)
+            if points is None:
+                track.lost = True
+                ok = False
+                continue
+            points = points + np.array([left, top], dtype=np.float32)
+
+            moved, status, _ = cv2.calcOpticalFlowPyrLK(prev_gray, gray, points, None)
+            good = status.ravel() == 1
+            if good.sum() < 3:
+                track.lost = True
+                ok = False
+                continue
+
+            dx, dy = np.median((moved[good] - points[good]).reshape(-1, 2), axis=0) / scale
+            top, right, bottom, left = track.location
+            track.location = (int(top + dy), int(right + dx), int(bottom + dy), int(left + dx))
+        return ok
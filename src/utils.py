@@ -1 +1,47 @@
-# Add utility functions here if necessary
\ No newline at end of file
+import struct
+import numpy as np
+import config
+
+# Versioned face encoding blobs stored in students.face_encoding.
+#
+#   legacy  raw float64 values, no header (8 * dim bytes)
+#   0x01    header byte + float32 values (1 + 4 * dim bytes)
+#   0x02    header byte + float32 scale + int8 values (5 + dim bytes)
+#
+# Headered blobs never have a length divisible by 8 for 128-d encodings,
+# which is how legacy rows are told apart during a rollout.
+FORMAT_FLOAT32 = 0x01
+FORMAT_INT8 = 0x02
+
+FORMATS = {"float32": FORMAT_FLOAT32, "int8": FORMAT_INT8}
+
+
+def encode_face_encoding(face_encoding, fmt=None):
+    """Serialize a face encoding to a versioned blob."""
+    version = FORMATS[fmt or config.ENCODING_FORMAT]
+    face_encoding = np.asarray(face_encoding, dtype=np.float32)
+    if version == FORMAT_FLOAT32:
+        return bytes([FORMAT_FLOAT32]) + face_encoding.tobytes()
+
+    # Symmetric per-vector quantization to [-127, 127]
+    scale = float(np.abs(face_encoding).max()) / 127.0 or 1.0
+    quantized = np.clip(np.rint(face_encoding / scale), -127, 127).astype(np.int8)
+    return bytes([FORMAT_INT8]) + struct.pack("<f", scale) + quantized.tobytes()
+
+
+def is_legacy_blob(blob):
+    return len(blob) % 8 == 0
+
+
+def decode_face_encoding(blob):
+    """Deserialize a face encoding blob of any version to float32."""
+    if is_legacy_blob(blob):
+        return np.frombuffer(blob, dtype=np.float64).astype(np.float32)
+
+    version = blob[0]
+    if version == FORMAT_FLOAT32:
+        return np.frombuffer(blob, dtype=np.float32, offset=1)
+    if version == FORMAT_INT8:
+        (scale,) = struct.unpack_from("<f", blob, 1)
+        return np.frombuffer(blob, dtype=np.int8, offset=5).astype(np.float32) * np.float32(scale)
+    raise ValueError(f"Unknown face encoding format: {version:#x}")